@@ -52,28 +52,31 @@ class FrostServer:
     def print_content(self, content):
         return print(json.dumps(content, indent=4, ensure_ascii=False))
     
-    def get_all_observations(self, limit_per_page=1000):
+    def iter_observation_pages(self, limit_per_page=1000):
+        """Liefert die Observations seitenweise (je Seite eine Liste), statt alles zu sammeln."""
         observation_url = self.get_observations_url()
         params = {
-            f"$top": {limit_per_page},  # Limit to 1000 observations per page
+            "$top": limit_per_page,  # Limit to 1000 observations per page
             "$orderby": "phenomenonTime asc"  # Sort by phenomenonTime in ascending order
         }
-        all_observations = []
         next_link = observation_url
 
         while next_link:
             response = requests.get(next_link, params=params if next_link == observation_url else None)
             if response.status_code == 200:
                 data = response.json()
-                all_observations.extend(data["value"])
+                yield data["value"]
 
                     # Check for pagination link
                 next_link = data.get("@iot.nextLink")  # Automatically handles pagination
             else:
                 print(f"Error: {response.status_code}")
                 break
-        
 
+    def get_all_observations(self, limit_per_page=1000):
+        all_observations = []
+        for page in self.iter_observation_pages(limit_per_page):
+            all_observations.extend(page)
         return all_observations
 
     
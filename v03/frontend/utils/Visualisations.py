@@ -4,6 +4,22 @@ import plotly.express as px
 import plotly.graph_objects as go
 
 
+# Ab so vielen Punkten wird ein Trace mit WebGL (go.Scattergl) statt als SVG (go.Scatter) gezeichnet
+WEBGL_THRESHOLD = 5000
+
+
+def line_trace(x, y, webgl_threshold: int | None = WEBGL_THRESHOLD, **kwargs):
+    """
+    Erstellt einen Linien-Trace: go.Scatter (SVG) oder bei vielen Punkten go.Scattergl (WebGL).
+    Beide bekommen dieselben Optionen (mode, name, line, visible, hover...), Aussehen und Legende bleiben gleich.
+
+    :param webgl_threshold: Ab dieser Punktzahl WebGL verwenden, None für immer SVG.
+    """
+    use_webgl = webgl_threshold is not None and len(x) >= webgl_threshold
+    trace = go.Scattergl if use_webgl else go.Scatter
+    return trace(x=x, y=y, **kwargs)
+
+
 # -----------------------------------
 class ShowMap:
     def __init__(self, data: list[dict], zoom: int = 7, control_scale: bool = False):
@@ -120,12 +136,16 @@ class ShowMap:
 
 
 class LinePlot:
-    def __init__(self, x, y, title, x_label, y_label):
+    def __init__(self, x, y, title, x_label, y_label, webgl_threshold: int | None = WEBGL_THRESHOLD):
+        """
+        :param webgl_threshold: Ab dieser Punktzahl mit WebGL zeichnen (siehe line_trace).
+        """
         self.x = x
         self.y = y
         self.x_label = x_label
         self.y_label = y_label
         self.title = title
+        self.webgl_threshold = webgl_threshold
 
         # Konvertiere x in ein Datetime-Format, falls es nicht bereits ist
         self.x = pd.to_datetime(self.x)
@@ -134,9 +154,10 @@ class LinePlot:
         # Erstelle den Plot
         fig = go.Figure(
             [
-                go.Scatter(
-                    x=self.x,
-                    y=self.y,
+                line_trace(
+                    self.x,
+                    self.y,
+                    webgl_threshold=self.webgl_threshold,
                     mode="lines",
                     name=self.title,
                     line=dict(color="rgb(255, 102, 102)", width=2),
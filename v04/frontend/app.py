@@ -1,19 +1,27 @@
 import pandas as pd
 import streamlit as st
-from utils.Visualisations import ShowMap, LinePlot, Windrose
+from utils.Visualisations import ShowMap, LinePlot, Windrose, line_trace
 #from utils.data_loader import get_marina_data
 import json
 import plotly.graph_objects as go
-from utils.FrostServer import FrostServerClient
+from utils.FrostServer import FrostServerClient, apply_name_replacements, exclude_names_filter, utc_naive
+from utils.ObservationSync import ObservationSync
+from utils.ObservationStore import ObservationStore
+from utils.FrostCache import FrostCache, DiskCache
+from utils.DataSnapshot import SnapshotStore, SnapshotRefresher
+from utils.TimeSeries import TimeSeries
+from utils.Downsampling import point_budget
+from utils.Rollups import Rollup, RollupCache
+from utils.StationIndex import StationIndex
+from utils.StationRegistry import StationRegistry, Station
+from utils.MapCache import RenderedMap, render_map, st_rendered_map
 from pprint import pprint
-from streamlit_folium import st_folium
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
 import folium
 import streamlit as st
 from streamlit_javascript import st_javascript
-from streamlit_folium import st_folium
 
 
 
@@ -30,25 +38,150 @@ print("\nStarting Streamlit App...\n")
 st.set_page_config(layout="wide", page_title="SOOP-Dashboard", page_icon=":shark:")
 
 API_URL = "http://localhost:8000/data"
-
-
-# Konvertiere Timestamps in Strings
+FROST_URL = "https://timeseries.geomar.de/soop/FROST-Server/v1.1/"
+
+# Anzahl paralleler Worker beim Laden der Things bzw. Datastreams
+PRELOAD_WORKERS = 8
+# Anzahl der neuesten Observations je Datastream, die beim Auswählen einer Marina geladen werden
+RECENT_TOP = 10000
+# Hintergrund-Aktualisierung von Things, Datastreams und neuesten Werten
+LATEST_REFRESH = pd.Timedelta(minutes=5)
+# Maximales Alter des gemeinsamen Datenstands, falls die Hintergrund-Aktualisierung nicht läuft
+SNAPSHOT_TTL = pd.Timedelta(hours=2)
+# Wie lange geladene Zeitreihen im Cache bleiben und wie viele Datastreams maximal
+HISTORY_CACHE_ENTRIES = 256
+HISTORY_TTL = pd.Timedelta(hours=1)
+# Lokaler Speicher der Observations (Parquet je Datastream und Monat)
+OBSERVATION_STORE_DIR = ".cache/observations"
+# HTTP-Cache für FROST-Antworten (TTL je Entity-Typ, siehe utils/FrostCache.py)
+FROST_CACHE_DIR = ".cache/frost"
+FROST_CACHE_BYTES = 256 * 1024 * 1024
+
+# Darstellung der Stationen auf der Karte: 'markers', 'cluster' oder 'geojson' (bei sehr vielen Things)
+MAP_MODE = "markers"
+# Marker ohne eingebettete Popups: die neuesten Werte der angeklickten Marina zeigt section1 unter der Karte
+LAZY_POPUPS = True
+
+# Traces mit mehr Punkten werden mit WebGL gezeichnet (z.B. bei breiten Bildschirmen im Kontrollraum)
+WEBGL_THRESHOLD = 5000
+
+SKIP_THINGS = ['TGPS Box Ship', 'Kitchen', 'Kitchen #2', 'Test Box', 'SOOP_Fridtjof_Nansen']
+
+THING_NAME_REPLACEMENTS = {
+    "box_gmr_twl-box_0924002": "Marina Kappeln",
+    "box_gmr_twl-box_0924005": "Im Jaich, Stadthafen Flensburg",
+}
+
+
+# Konvertiere Timestamps und Zeitreihen in JSON-taugliche Werte (json.dumps(..., default=convert_timestamps))
 def convert_timestamps(obj):
     if isinstance(obj, pd.Timestamp):
         return obj.isoformat()
+    if isinstance(obj, TimeSeries):
+        return obj.to_dict()
     return obj
 
 
+@st.cache_resource
+def get_frost_cache() -> FrostCache:
+    """Prozessweiter Cache für FROST-Antworten, gemeinsam für alle Sessions."""
+    return FrostCache(DiskCache(FROST_CACHE_DIR, max_bytes=FROST_CACHE_BYTES))
+
+
+@st.cache_resource
+def get_observation_sync() -> ObservationSync:
+    """Prozessweiter Abgleich zwischen lokalem Observation-Speicher und FROST-Server."""
+    return ObservationSync(
+        FrostServerClient(FROST_URL, pool_size=PRELOAD_WORKERS, cache=get_frost_cache()),
+        store=ObservationStore(OBSERVATION_STORE_DIR),
+        full_top=RECENT_TOP,
+    )
+
+
+def data_fingerprint(thing_dicts: list) -> tuple:
+    """Things, Datastreams und Zeitpunkt der neuesten Observation; ändert sich nichts davon, bleibt der Snapshot."""
+    return tuple(
+        (thing["@iot.id"], thing["name"], tuple(
+            (datastream["id"], datastream["observations"].last_time) for datastream in thing["datastreams"]
+        ))
+        for thing in thing_dicts
+    )
+
+
+def refresh_latest(data: list | None) -> list | None:
+    """
+    Lädt Metadaten und neueste Werte neu (eine $expand-Abfrage pro Thing mit top=1, unabhängig davon,
+    wie viele Observations ein Datastream hat). Gibt None zurück, wenn sich nichts geändert hat,
+    damit Karte und abgeleitete Strukturen nicht ohne Grund neu gebaut werden.
+    """
+    new_data = StreamlitApp().preload_data()
+    if data is not None and data_fingerprint(new_data) == data_fingerprint(data):
+        return None
+    return new_data
+
+
+@st.cache_resource
+def get_snapshot_store() -> SnapshotStore:
+    """
+    Prozessweiter Datenstand (Version + TTL), wird einmal geladen und von allen Sessions gelesen.
+    Enthält nur Metadaten und die neueste Observation je Datastream, siehe load_recent.
+    Ein Hintergrund-Thread veröffentlicht regelmäßig neue Stände, Sessions warten nie auf den Server.
+    """
+    store = SnapshotStore(lambda: StreamlitApp().preload_data(), ttl=SNAPSHOT_TTL.total_seconds())
+    SnapshotRefresher(store, {
+        "latest": (LATEST_REFRESH.total_seconds(), refresh_latest),
+    }).start()
+    return store
+
+
+@st.cache_resource
+def get_rollups() -> RollupCache:
+    """
+    Prozessweite Rollup-Pyramiden (10 min / 1 h / 1 Tag) je Datastream für lange Zeiträume.
+    Gleiche Grenzen wie load_recent / load_history, damit keine Pyramide die Zeitreihen überlebt.
+    """
+    return RollupCache(max_entries=HISTORY_CACHE_ENTRIES, ttl=HISTORY_TTL.total_seconds())
+
+
+# cache_resource statt cache_data: gibt bei jedem Rerun dieselbe (unveränderliche) TimeSeries zurück,
+# statt sie jedes Mal zu deserialisieren. Zeitraum-Wechsel kosten so nur die binäre Suche in window().
+@st.cache_resource(ttl=HISTORY_TTL, max_entries=HISTORY_CACHE_ENTRIES, show_spinner="Lade Messwerte...")
+def load_recent(datastream_id: int, latest_time: pd.Timestamp) -> TimeSeries:
+    """
+    Lädt die neuesten RECENT_TOP Observations eines Datastreams erst, wenn seine Marina ausgewählt wird.
+    Aus dem lokalen Speicher, vom Server kommt nur, was seit dem letzten Laden neu ist.
+    latest_time: neueste Observation laut Snapshot; ändert sie sich, wird neu geladen.
+    """
+    datastream = {"id": datastream_id, "observations": TimeSeries([latest_time], [np.nan])}
+    get_observation_sync().hydrate_datastream(datastream)
+    return datastream["observations"]
+
+
+@st.cache_resource(ttl=HISTORY_TTL, max_entries=HISTORY_CACHE_ENTRIES, show_spinner="Lade Messwerte...")
+def load_history(datastream_id: int, start: pd.Timestamp) -> TimeSeries:
+    """Lädt alle Observations eines Datastreams ab start (parallel in Monatsfenstern)."""
+    frost = FrostServerClient(FROST_URL, pool_size=PRELOAD_WORKERS, cache=get_frost_cache())
+    times, values = frost.get_observations(datastream_id, start)
+    frost.close()
+    return TimeSeries(times, values)
+
+
 class StreamlitApp:
     def __init__(self):
         pass
 
 
 
-    def preload_data(self):
+    def preload_data(self, max_workers: int = PRELOAD_WORKERS, top: int = 1):
 
 
         """
+        Lädt alle Things mit einer seitenweisen $expand-Abfrage (Locations, Datastreams und Observations
+        auf einmal, siehe FrostServerClient.load_thing_graph). Die Reihenfolge der Things bleibt erhalten.
+        max_workers: Größe des Verbindungspools des Clients
+        Geladen werden nur Metadaten und die neuesten 'top' Observations je Datastream (für die Karte),
+        die Zeitreihen einer Marina lädt section3 erst bei Auswahl (load_recent / load_history).
+
         Returns list of dictionaries with the following structure:
         [
             {
@@ -57,16 +190,7 @@ class StreamlitApp:
                             'id': 1,
                             'name': 'WTemp* measured by sensor '
                                     '*c7991906-983b-4bf3-849f-14a139ffe4f3*',
-                            'observations': {'time': ['2025-05-13 10:36:59',
-                                                        '2025-05-13 09:37:00',
-                                                        '2025-05-13 08:37:04',
-                                                        '2025-05-13 07:37:19',
-                                                        '2025-05-13 06:37:09'],
-                                                'values': [14.62,
-                                                        14.37,
-                                                        14.18,
-                                                        14.0,
-                                                        13.87]}}],
+                            'observations': TimeSeries(1 Werte, 2025-05-13 10:36:59 bis 2025-05-13 10:36:59)}],
             'description': 'LoRaWan box for temperature at Kiel, Reventlou.',
             'locations': [{'@iot.id': 1,
                             '@iot.selfLink': 'https://timeseries.geomar.de/soop/FROST-Server/v1.1/Locations(1)',
@@ -82,178 +206,38 @@ class StreamlitApp:
         ]
         """   
 
-        
-        frost = FrostServerClient("https://timeseries.geomar.de/soop/FROST-Server/v1.1/")
-        things = frost.list_things()
-        print(f"Anzahl Things on Frost-Server: {len(things)}")
-
-        thing_dicts = [] 
-        for thing in things:
-
-            skip_list = ['TGPS Box Ship', 'Kitchen', 'Kitchen #2', 'Test Box', 'SOOP_Fridtjof_Nansen']
-            if thing["name"] in skip_list:
-               continue
-
-            ######################################################################################################
-            # Get Locations of the Thing
-            ######################################################################################################
-
-            locations = frost.get_entities(entity_type=f'Things({thing["@iot.id"]})/Locations')
-            
-            # Check in Datastreas for locations if not found in Locations
-            if not locations:
-                # Try to search for locations in the datastreams
-                datastreams = frost.get_entities(entity_type=f'Things({thing["@iot.id"]})/Datastreams')
-                if datastreams:
-                    latitudes = []
-                    longitudes = []
-                    for datastream in datastreams:
-
-                        lat = None
-                        lon = None
-                        if 'latitude' in datastream['name'].lower():
-
-                            # Get Observations for the datastream
-                            observations = frost.get_observations_for_datastream(datastream['@iot.id'], top=1000)
-
-                            if observations:
-                                # get the first observation
-                                # get unique values
-                                unique_observations = {obs['result'] for obs in observations}
-                                all_obs = [obs['result'] for obs in observations]
-                                # convert all_obs to set
-                                unique_observations = set(all_obs)
-                                print(f'\nall_obs: {len(all_obs)}')
-                                print(f'\nunique_obs: {unique_observations}')
-
-                                # convert to list
-                                unique_observations = list(unique_observations)
-                                first_observation = observations[0]
-                                
-                                lat = first_observation['result']
-                                latitudes.append(lat)
-
-                        if 'longitude' in datastream['name'].lower():
-                            # Get Observations for the datastream
-                            observations = frost.get_observations_for_datastream(datastream['@iot.id'])
-
-                            if observations:
-                                # get the first observation
-                                # get unique values
-                                unique_observations = {obs['result'] for obs in observations}
-                                all_obs = [obs['result'] for obs in observations]
-                                # convert all_obs to set
-                                unique_observations = set(all_obs)
-                                print(f'\nall_obs: {len(all_obs)}')
-                                print(f'\nunique_obs: {unique_observations}')
-
-                                # convert to list
-                                unique_observations = list(unique_observations)
-                                first_observation = observations[0]
-                                
-                                lon = first_observation['result']
-                                longitudes.append(lon)
-
-                    location = np.array([longitudes, latitudes])
-                    # remove duplicates
-                    location = np.unique(location, axis=1)
-                    location = location.tolist()
-                    # make list[longitude, latitude]
-                    location = [longitudes[0], latitudes[0]]
-                    locations = [{'location': {'type': 'Point', 'coordinates': location}}]
-
-            ##############################################################################################
-            # Get the datastreams for the things
-            ##############################################################################################
-            datastreams = frost.get_entities(entity_type=f'Things({thing["@iot.id"]})/Datastreams')
-            datastream_list = []
-            for datastream in datastreams:
-                if 'latitude' in datastream['name'].lower() or 'longitude' in datastream['name'].lower():
-                    continue
-                ##############################################################################################
-                # Get the observations for each datastream and thing
-                ##############################################################################################
-                observations = frost.get_observations_for_datastream(datastream['@iot.id'], top=10000)
-                df = pd.DataFrame(observations)
-                df = df.loc[:, ['phenomenonTime', 'result']]
-                
-                observations = df.rename(columns={'phenomenonTime': 'time', 'result': 'values'})
-                # convert 'time' to stringformat
-                observations['time'] = pd.to_datetime(observations['time'], errors="coerce", format="mixed").dt.tz_localize(None)
-                observations['time'] = observations['time'].dt.strftime('%Y-%m-%d %H:%M:%S')
-                observations = observations.to_dict(orient='list')
-                if observations:
-                    # get the first observation
-
-                    # check if datastream['unitOfMeasurement']['symbol'] is Cel then replace it with °C
-                    if datastream['unitOfMeasurement']['symbol'] == 'Cel':
-                        datastream['unitOfMeasurement']['symbol'] = '°C'
-
-                    datastream_list.append({
-                        "name": datastream["name"],
-                        "id": datastream["@iot.id"],
-                        "description": datastream["description"],
-                        'unitOfMeasurement': datastream["unitOfMeasurement"],
-                        "observations": observations,
-
-                    })
-
-            #pprint(datastream_list)
-            
-            
-
-            
-
-            
-            thing_dict = {
-                "name": thing["name"],
-                "description": thing["description"],
-                "@iot.id": thing["@iot.id"],
-
-                "locations": locations,
-                'datastreams': datastream_list,
-            }
-
-            replace_names = {
-                "box_gmr_twl-box_0924002": "Marina Kappeln",
-                "box_gmr_twl-box_0924005": "Im Jaich, Stadthafen Flensburg",
-            }
-            # replace the name of the thing with the name in the replace_names dict
-            for key, value in replace_names.items():
-                if key in thing_dict["name"]:
-                    thing_dict["name"] = value
-                    #print(f"Replaced {key} with {value} in {thing_dict['name']}")
-                    break
-
-            thing_dicts.append(thing_dict)
-            
+        frost = FrostServerClient(FROST_URL, pool_size=max_workers, cache=get_frost_cache())
+        # Skip-Liste als $filter, damit der Server die Things gar nicht erst schickt
+        thing_dicts = frost.load_thing_graph(filter=exclude_names_filter(SKIP_THINGS), top=top)
+        frost.close()
+        print(f"Anzahl Things on Frost-Server: {len(thing_dicts)}")
+
+        apply_name_replacements(thing_dicts, THING_NAME_REPLACEMENTS)
 
         #pprint(thing_dicts)
         return thing_dicts
 
 
 
-    def get_last_measurement(self, measurement):
-        """Returns the latest measurement from a list of time-series data."""
+    def get_last_measurement(self, measurement: TimeSeries | None):
+        """Returns the latest measurement of a time series."""
         if not measurement:
             return None
-        df = pd.DataFrame.from_dict(measurement).sort_values("time", ascending=False)
-        return df.iloc[0] if not df.empty else None
+        return pd.Series({"time": measurement.last_time, "values": measurement.last_value})
 
-    def get_measurements(self, measurement):
-        """Converts measurement data into a sorted DataFrame."""
+    def get_measurements(self, measurement: TimeSeries | None):
+        """Converts a time series into a DataFrame, newest first."""
         if not measurement:
             return None
-        df = pd.DataFrame.from_dict(measurement)
-        df["time"] = pd.to_datetime(df["time"], errors="coerce")
-        df["values"] = pd.to_numeric(df["values"], errors="coerce")
-        df.dropna(inplace=True)
-        return df.sort_values("time", ascending=False) if not df.empty else None
+        df = measurement.to_frame().dropna()
+        return df.iloc[::-1] if not df.empty else None
 
     # st.write(st.session_state)
     def header(self):
-        if "preloaded_data" not in st.session_state:
-            st.session_state["preloaded_data"] = self.preload_data()
+        # Alle Sessions teilen sich einen Snapshot, die Session merkt sich nur die Referenz
+        snapshot = get_snapshot_store().get()
+        st.session_state["snapshot"] = snapshot
+        st.session_state["preloaded_data"] = snapshot.data
         # with st.sidebar:
         #     st.write(st.session_state["preloaded_data"])
 
@@ -271,27 +255,54 @@ class StreamlitApp:
             self.section3()
         st.divider()
 
+    def registry(self) -> StationRegistry:
+        """Stationen des aktuellen Snapshots nach Name und @iot.id (einmal pro Snapshot gebaut)."""
+        return st.session_state.snapshot.derive("registry", StationRegistry)
+
+    def selected_station(self) -> Station | None:
+        return self.registry().get(st.session_state.get("selected_marina", None))
+
+    def rendered_map(self) -> RenderedMap:
+        """
+        Fertig serialisierte Karte des aktuellen Snapshots, gemeinsam für alle Sessions.
+        Popups zeigen die neuesten Werte, mit einem neuen Snapshot wird die Karte daher neu gebaut.
+        """
+        def build(data: list) -> RenderedMap:
+            folio_map = ShowMap(
+                data=data,
+                zoom=7,
+                control_scale=True,
+                registry=self.registry(),
+                mode=MAP_MODE,
+                lazy_popups=LAZY_POPUPS,
+                geojson=self.stations_geojson() if MAP_MODE == "geojson" else None,
+            ).plot()
+            return render_map(folio_map)
+
+        return st.session_state.snapshot.derive(("map", MAP_MODE, LAZY_POPUPS), build)
+
+    def stations_geojson(self) -> dict:
+        """Alle Stationen als GeoJSON-FeatureCollection (dict), einmal pro Snapshot erzeugt."""
+        return st.session_state.snapshot.derive("geojson", lambda data: self.registry().to_geojson())
+
+    def station_details(self, station: Station):
+        """Neueste Werte einer Marina (statt Popup in der Karte), Daten aus der StationRegistry."""
+        values = " · ".join(
+            f"{record.display_name}: **{value:.2f}** {record.unit}" for record, value in station.latest_values()
+            if not np.isnan(value)
+        )
+        st.markdown(f"**{station.name}** — {values or 'keine aktuellen Werte'}")
+
     def section1(self):
         # 1) Marina-Liste initialisieren
         if "selected_marinas" not in st.session_state:
-            st.session_state.selected_marinas = [
-                marina["name"] for marina in st.session_state.preloaded_data
-            ]
+            st.session_state.selected_marinas = self.registry().names
         # initialisiere den ersten Marina-Namen
         if "selected_marina" not in st.session_state:
             st.session_state.selected_marina = st.session_state.selected_marinas[0]
 
-        # 2) Map erzeugen / cachen
-        if "folium_map" not in st.session_state:
-            folio_map = ShowMap(
-                data=st.session_state.preloaded_data,
-                zoom=7,
-                control_scale=True
-            ).plot()
-            if not isinstance(folio_map, folium.Map):
-                st.warning("Die Karte konnte nicht erstellt werden.")
-                return
-            st.session_state.folium_map = folio_map
+        # 2) Map erzeugen / cachen (einmal pro Snapshot für alle Sessions)
+        rendered_map = self.rendered_map()
 
         # 3) Map rendern und Klick-Data abholen
         # 1) Bildschirmmaße per JS
@@ -303,8 +314,10 @@ class StreamlitApp:
         # Beim allerersten Laden kann None zurückkommen, also sicherheitshalber default-Werte nehmen:
         w = screen_width  or 800
         h = screen_height or 600
-        map_data = st_folium(
-            st.session_state.folium_map,
+        # Für das Punktebudget der Plots in section3
+        st.session_state["screen_width"] = w
+        map_data = st_rendered_map(
+            rendered_map,
             width = w  - 40,              # z.B. 40px Rand
             height= int(h * 0.9)         # 90% der Fensterhöhe
         )
@@ -328,7 +341,8 @@ class StreamlitApp:
 
             if event_key in ("last_object_clicked_tooltip", "last_object_clicked_popup"):
                 # Hier steht der Marina-Name direkt im Tooltip/Popup
-                st.session_state.selected_marina = event_val
+                # (GeoJSON-Tooltips kommen als Tabellentext mit Leerzeichen/Zeilenumbrüchen)
+                st.session_state.selected_marina = event_val.strip()
 
             elif event_key == "last_object_clicked":
                 # GeoJSON-Feature: versuche, den Namen aus properties zu holen
@@ -337,9 +351,9 @@ class StreamlitApp:
                 if name:
                     st.session_state.selected_marina = name
                 else:
-                    # Fallback: benutze Koordinaten-Approach
+                    # Fallback: benutze Koordinaten-Approach (Feature-Geometrie oder Klickposition)
                     coords = event_val.get("geometry", {}).get("coordinates", [])
-                    lon0, lat0 = coords if len(coords) == 2 else (None, None)
+                    lon0, lat0 = coords if len(coords) == 2 else (event_val.get("lng"), event_val.get("lat"))
                     if lat0 is not None:
                         st.session_state.selected_marina = self._closest_marina(lat0, lon0)
 
@@ -360,39 +374,28 @@ class StreamlitApp:
 
         # 7) Anzeige
         #st.write("Aktuell ausgewählt:", st.session_state.selected_marina)
+        station = self.selected_station()
+        if LAZY_POPUPS and station:
+            self.station_details(station)
         
 
 
 
 
     def _closest_marina(self, lat0: float, lon0: float) -> str:
-        """Hilfsmethode: findet die Marina mit dem kürzesten euklidischen Abstand."""
-        closest = min(
-            st.session_state.preloaded_data,
-            key=lambda m: (
-                (m["locations"][0]["location"]["coordinates"][1] - lat0) ** 2
-                + (m["locations"][0]["location"]["coordinates"][0] - lon0) ** 2
-            )
-        )
-        return closest["name"]
+        """Hilfsmethode: findet die Marina mit dem kürzesten Großkreisabstand (Index einmal pro Snapshot)."""
+        index = st.session_state.snapshot.derive("stations", StationIndex.from_things)
+        return index.closest(lat0, lon0)
 
 
     def section2(self):
-        selected_marina = st.session_state.get("selected_marina", None)
-        marina_data = next(
-            (
-                m
-                for m in st.session_state["preloaded_data"]
-                if m["name"] == selected_marina
-            ),
-            None,
-        )
+        station = self.selected_station()
 
-        if not marina_data:
+        if not station:
             st.warning("Keine Daten verfügbar")
             return
 
-        measurement = marina_data.get("measurement", {})
+        measurement = station.thing.get("measurement", {})
 
         data_dict = {
             "Wassertemperatur [°C]": self.get_last_measurement(
@@ -477,16 +480,21 @@ class StreamlitApp:
             unsafe_allow_html=True,
         )
 
+    def _history_start(self, datastream: dict, cutoff: pd.Timestamp) -> pd.Timestamp | None:
+        """Beginn der benötigten Historie: Cutoff, aber nicht vor der ersten Observation auf dem Server."""
+        phenomenon_time = datastream.get("phenomenonTime")
+        if not phenomenon_time:
+            return None
+        server_start = utc_naive(phenomenon_time.split("/")[0])
+        return max(cutoff, server_start)
+
     def section3(self):
-        marina_name = st.session_state.get("selected_marina", None)
-        marina_data = next(
-            (m for m in st.session_state["preloaded_data"] if m["name"] == marina_name),
-            None,
-        )
+        station = self.selected_station()
 
-        if not marina_data:
+        if not station:
             st.warning("Keine Daten verfügbar")
             return
+        marina_name = station.name
         
         # Plot the data
         st.markdown(
@@ -519,46 +527,57 @@ class StreamlitApp:
 
         # 4) Units sammeln
         units = set()
+        max_points = point_budget(st.session_state.get("screen_width", 1500))
 
         # 5) Für jeden Datastream: DataFrame bauen und filtern
-        for i, datastream in enumerate(marina_data["datastreams"]):
-            df = pd.DataFrame.from_dict(datastream["observations"])
-            df["time"] = pd.to_datetime(df["time"], errors="coerce")
-            df["values"] = pd.to_numeric(df["values"], errors="coerce")
-            df.dropna(inplace=True)
-
-            # 5a) Nur Daten ab Cutoff berücksichtigen
-            df = df[df["time"] >= cutoff]
-            if df.empty:
+        for i, record in enumerate(station.datastreams):
+            datastream = record.datastream
+            series = datastream["observations"]
+            if series:
+                series = load_recent(datastream["id"], series.last_time)
+
+            # 5a) Reichen die vorgeladenen Daten nicht bis zum Cutoff zurück, die komplette
+            #     Historie ab Cutoff (bzw. Beginn des Datastreams) vom Server holen
+            history_start = self._history_start(datastream, cutoff)
+            if history_start is not None and (not series or history_start < series.first_time):
+                # Auf den Tag abrunden, damit load_history zwischen Reruns aus dem Cache kommt
+                series = load_history(datastream["id"], history_start.floor("D"))
+
+            # 5b) Nur Daten ab Cutoff: Rohdaten, wenn sie ins Punktebudget passen, sonst die
+            #     vorberechnete Rollup-Stufe (10 min / 1 h / 1 Tag), die den Plot noch füllt
+            selection = get_rollups().get(datastream["id"], series).select(cutoff, None, max_points)
+            if not len(selection):
                 continue
+            trace_options = {}
+            if isinstance(selection, Rollup):
+                series = selection.mean_series()
+                trace_options = dict(
+                    customdata=np.column_stack([selection.min, selection.max, selection.count]),
+                    hovertemplate=(
+                        f"Ø %{{y:.2f}} ({selection.freq}, min %{{customdata[0]:.2f}}, "
+                        f"max %{{customdata[1]:.2f}}, n=%{{customdata[2]:.0f}})"
+                    ),
+                )
+            else:
+                series = selection
 
-            # 5b) Unit-Symbol hinzufügen
-            unit = datastream.get("unitOfMeasurement", {}).get("symbol", "")
-            if unit:
-                units.add(unit)
+            # 5c) Unit-Symbol hinzufügen
+            if record.unit:
+                units.add(record.unit)
 
             # 6) Sichtbarkeit: nur erstes Trace direkt sichtbar
             visible = True if i == 0 else "legendonly"
 
-            # 7) Trace hinzufügen
-            name = (
-                datastream["name"]
-                .split("*")[0]
-                .strip()
-                .capitalize()
-                .replace("_", " ")
-            )
-            # add unit to name
-            if unit:
-                name += f" [{unit}]"
-            
+            # 7) Trace hinzufügen (Name mit Einheit aus der StationRegistry)
             fig.add_trace(
-                go.Scatter(
-                    x=df["time"],
-                    y=df["values"],
+                line_trace(
+                    series.times,
+                    series.values,
+                    webgl_threshold=WEBGL_THRESHOLD,
                     mode="lines",
-                    name=name,
+                    name=record.label,
                     visible=visible,
+                    **trace_options,
                 )
             )
 
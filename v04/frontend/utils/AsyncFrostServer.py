@@ -0,0 +1,218 @@
+import asyncio
+import httpx
+from urllib.parse import urljoin
+from typing import Optional, Dict, Any, AsyncIterator
+
+from .FrostServer import (
+    FrostServerClient, build_thing_dict, apply_name_replacements, locations_from_datastreams, decode_data_array,
+    odata_params, exclude_names_filter, THING_SELECT, DATASTREAM_SELECT, OBSERVATION_SELECT,
+    POSITION_DATASTREAM_FILTER,
+)
+
+
+class AsyncFrostServerClient:
+    def __init__(self, base_url: str, max_concurrency: int = 16, timeout: float = 30):
+        """
+        Asynchrone Variante von FrostServerClient für async Services (FastAPI, Refresh-Worker).
+
+        base_url: z.B. 'https://timeseries.geomar.de/soop/FROST-Server/v1.1/'
+        max_concurrency: maximale Anzahl gleichzeitig laufender Requests an den Server.
+        timeout: Timeout in Sekunden pro Request.
+        """
+        if not base_url.endswith('/'):
+            base_url += '/'
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+        )
+        # Begrenzt die Anzahl gleichzeitiger Requests, egal wie viele Tasks den Client nutzen
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def close(self):
+        """
+        Schließt alle offenen Verbindungen des Clients.
+        """
+        await self.client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def _get_json(self, url: str, params: Optional[Dict[str, Any]] = None) -> dict:
+        """
+        Führt einen GET-Request aus und gibt die JSON-Antwort zurück.
+        """
+        async with self._semaphore:
+            response = await self.client.get(url, params=params)
+        response.raise_for_status()
+        return response.json()
+
+    async def get_entities(self, entity_type: str, params: Optional[Dict[str, Any]] = None,
+                           select=None, filter: Optional[str] = None, orderby: Optional[str] = None) -> list:
+        """
+        entity_type: 'Things', 'Datastreams', 'Observations', 'Locations', etc.
+        params: Optional: Dictionary mit OData-Parametern wie $filter, $expand, $top, etc.
+        select, filter, orderby: Kurzform für $select (str oder Liste), $filter und $orderby
+        Rückgabe: Liste mit Objekten (dicts)
+        """
+        params = odata_params(params, select, filter, orderby)
+        data = await self._get_json(urljoin(self.base_url, entity_type), params=params)
+        return data.get('value', [])
+
+    async def iter_pages(self, entity_type: str, params: Optional[Dict[str, Any]] = None, select=None,
+                         filter: Optional[str] = None, orderby: Optional[str] = None) -> AsyncIterator[list]:
+        """
+        Liefert die Seiten einer Entität nacheinander, indem es @iot.nextLink folgt.
+        """
+        url = urljoin(self.base_url, entity_type)
+        params = odata_params(params, select, filter, orderby)
+        while url:
+            data = await self._get_json(url, params=params)
+            yield data.get('value', [])
+            url = data.get('@iot.nextLink', None)
+            params = None  # nur beim ersten Request nötig
+
+    async def iter_entities(self, entity_type: str, params: Optional[Dict[str, Any]] = None, select=None,
+                            filter: Optional[str] = None, orderby: Optional[str] = None) -> AsyncIterator[dict]:
+        """
+        Liefert die Objekte einer Entität einzeln über alle Seiten hinweg.
+        """
+        async for page in self.iter_pages(entity_type, params=params, select=select, filter=filter, orderby=orderby):
+            for entity in page:
+                yield entity
+
+    async def get_all_paginated(self, entity_type: str, params: Optional[Dict[str, Any]] = None, select=None,
+                                filter: Optional[str] = None, orderby: Optional[str] = None) -> list:
+        """
+        Holt alle Daten einer Entität, auch wenn sie über mehrere Seiten verteilt sind.
+        """
+        entities = self.iter_entities(entity_type, params=params, select=select, filter=filter, orderby=orderby)
+        return [entity async for entity in entities]
+
+    async def get_observations_for_datastream(self, datastream_id: int, top: int = 100, select=None,
+                                              filter: Optional[str] = None,
+                                              orderby: str = "phenomenonTime desc") -> list:
+        """
+        Holt die letzten 'top' Beobachtungen eines bestimmten Datastreams (ein dict pro Observation).
+        """
+        entity = f"Datastreams({datastream_id})/Observations"
+        return await self.get_entities(entity, params={"$top": top}, select=select, filter=filter, orderby=orderby)
+
+    async def get_observation_arrays(self, datastream_id: int, top: int = 100, filter: Optional[str] = None,
+                                     orderby: str = "phenomenonTime desc") -> tuple:
+        """
+        Holt die letzten 'top' Beobachtungen als Tupel (times, values), siehe FrostServerClient.get_observation_arrays.
+        """
+        entity = f"Datastreams({datastream_id})/Observations"
+        params = {"$top": top, "$resultFormat": "dataArray"}
+        blocks = await self.get_entities(
+            entity, params=params, select=OBSERVATION_SELECT, filter=filter, orderby=orderby
+        )
+        return decode_data_array(blocks)
+
+    async def list_things(self, select=None, filter: Optional[str] = None, orderby: Optional[str] = None) -> list:
+        """
+        Gibt eine Liste aller Things zurück.
+        """
+        return await self.get_all_paginated("Things", select=select, filter=filter, orderby=orderby)
+
+    async def list_datastreams(self, select=None, filter: Optional[str] = None,
+                               orderby: Optional[str] = None) -> list:
+        """
+        Gibt eine Liste aller Datastreams zurück.
+        """
+        return await self.get_all_paginated("Datastreams", select=select, filter=filter, orderby=orderby)
+
+    async def _follow_next_links(self, entity: dict, navigation: str, limit: Optional[int] = None) -> list:
+        """
+        Wie FrostServerClient._follow_next_links: lädt abgeschnittene expandierte Collections nach.
+        """
+        items = list(entity.get(navigation, []))
+        url = entity.get(f'{navigation}@iot.nextLink')
+        while url and (limit is None or len(items) < limit):
+            data = await self._get_json(url)
+            items.extend(data.get('value', []))
+            url = data.get('@iot.nextLink')
+        return items if limit is None else items[:limit]
+
+    async def load_thing_graph(self, thing_id: Optional[int] = None, top: int = 100,
+                               params: Optional[Dict[str, Any]] = None, filter: Optional[str] = None) -> list:
+        """
+        Lädt Things inkl. Locations, Datastreams und den letzten 'top' Observations je Datastream
+        per verschachteltem $expand (siehe FrostServerClient.load_thing_graph).
+        Rückgabe: Liste von thing_dicts im Format von StreamlitApp.preload_data
+        """
+        params = odata_params(params, THING_SELECT, filter, None)
+        params["$expand"] = FrostServerClient.thing_graph_expand(top)
+        if thing_id is None:
+            things = await self.get_all_paginated("Things", params=params)
+        else:
+            things = [await self._get_json(urljoin(self.base_url, f"Things({thing_id})"), params=params)]
+        return await asyncio.gather(*(self._thing_graph_to_dict(thing, top) for thing in things))
+
+    async def _thing_graph_to_dict(self, thing: dict, top: int) -> dict:
+        """
+        Wandelt ein expandiertes Thing in ein thing_dict um und lädt abgeschnittene Collections nach.
+        """
+        locations, datastreams = await asyncio.gather(
+            self._follow_next_links(thing, 'Locations'),
+            self._follow_next_links(thing, 'Datastreams'),
+        )
+
+        async def load_observations(datastream: dict):
+            if 'Observations' in datastream:
+                datastream['Observations'] = await self._follow_next_links(datastream, 'Observations', limit=top)
+            else:
+                # Datastreams aus nachgeladenen Seiten haben evtl. keine expandierten Observations
+                datastream['Observations'] = await self.get_observations_for_datastream(
+                    datastream['@iot.id'], top=top, select=OBSERVATION_SELECT
+                )
+
+        await asyncio.gather(*(load_observations(datastream) for datastream in datastreams))
+
+        # Check in Datastreams for locations if not found in Locations
+        if not locations:
+            locations = locations_from_datastreams(await self.get_position_datastreams(thing["@iot.id"]))
+
+        return build_thing_dict(thing, locations, datastreams)
+
+    async def get_position_datastreams(self, thing_id: int) -> list:
+        """
+        Gibt die latitude/longitude-Datastreams eines Things inkl. ihrer neuesten Observation zurück.
+        """
+        return await self.get_entities(
+            f"Things({thing_id})/Datastreams",
+            params={"$expand": f"Observations($top=1;$orderby=phenomenonTime desc;$select={OBSERVATION_SELECT})"},
+            select=DATASTREAM_SELECT,
+            filter=POSITION_DATASTREAM_FILTER,
+        )
+
+    async def preload_data(self, top: int = 100, skip_things: tuple = (),
+                           name_replacements: Optional[dict] = None) -> list:
+        """
+        Async-Version von StreamlitApp.preload_data: lädt alle Things gleichzeitig
+        (begrenzt durch max_concurrency) und gibt die thing_dicts in Server-Reihenfolge zurück.
+        skip_things: Namen von Things, die übersprungen werden.
+        name_replacements: siehe apply_name_replacements
+        """
+        filter = exclude_names_filter(skip_things) if skip_things else None
+        things = await self.list_things(select=THING_SELECT, filter=filter)
+
+        graphs = await asyncio.gather(*(self.load_thing_graph(thing["@iot.id"], top=top) for thing in things))
+        thing_dicts = [graph[0] for graph in graphs]
+        return apply_name_replacements(thing_dicts, name_replacements or {})
+
+
+# Beispiel-Nutzung (aus v04/frontend: python -m utils.AsyncFrostServer):
+if __name__ == "__main__":
+
+    async def main():
+        async with AsyncFrostServerClient("https://timeseries.geomar.de/soop/FROST-Server/v1.1/") as frost:
+            thing_dicts = await frost.preload_data(top=100)
+            print(f"Anzahl Things: {len(thing_dicts)}")
+
+    asyncio.run(main())
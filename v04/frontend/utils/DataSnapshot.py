@@ -0,0 +1,166 @@
+import time
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable, Optional
+
+from .SingleFlight import SingleFlight
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    """
+    Unveränderlicher Stand der geladenen Daten. Ein neuer Stand bekommt immer eine neue Version,
+    ein veröffentlichter Snapshot wird danach nicht mehr verändert.
+    """
+    version: int
+    data: list
+    created: float = field(default_factory=time.time)
+    # Aus data abgeleitete Strukturen (z.B. Indizes), werden pro Snapshot einmal gebaut
+    _derived: dict = field(default_factory=dict, init=False, repr=False, compare=False)
+    # RLock: build darf selbst derive() aufrufen (z.B. die Karte die Registry)
+    _derived_lock: threading.RLock = field(default_factory=threading.RLock, init=False, repr=False, compare=False)
+
+    def age(self) -> float:
+        return time.time() - self.created
+
+    def derive(self, key: Hashable, build: Callable[[list], Any]) -> Any:
+        """
+        Gibt die aus data abgeleitete Struktur für key zurück und baut sie beim ersten Zugriff mit build(data).
+        Da data unveränderlich ist, bleibt das Ergebnis für die Lebensdauer des Snapshots gültig und wird
+        von allen Sessions gemeinsam genutzt. Mit einem neuen Snapshot wird automatisch neu gebaut.
+        """
+        with self._derived_lock:
+            if key not in self._derived:
+                self._derived[key] = build(self.data)
+            return self._derived[key]
+
+
+class SnapshotStore:
+    def __init__(self, loader: Callable[[], list], ttl: float):
+        """
+        Prozessweiter, thread-sicherer Speicher für den aktuellen Snapshot, gemeinsam für alle Sessions.
+        Sessions halten nur eine Referenz auf den Snapshot, keine eigene Kopie der Daten.
+
+        loader: Funktion, die einen kompletten neuen Datenstand (thing_dicts) lädt
+        ttl: Gültigkeitsdauer eines Snapshots in Sekunden, danach wird beim nächsten get() neu geladen
+        """
+        self.loader = loader
+        self.ttl = ttl
+        self._snapshot: Optional[Snapshot] = None
+        self._lock = threading.Lock()
+        # Gleichzeitige Kaltstarts teilen sich ein Laden, ohne publish() zu blockieren
+        self._loading = SingleFlight()
+        # Wird von SnapshotRefresher gesetzt, solange er im Hintergrund neue Stände veröffentlicht
+        self.refresher: Optional["SnapshotRefresher"] = None
+
+    def current(self) -> Optional[Snapshot]:
+        """
+        Gibt den aktuell veröffentlichten Snapshot zurück (ggf. abgelaufen) oder None.
+        """
+        return self._snapshot
+
+    def is_fresh(self, snapshot: Optional[Snapshot]) -> bool:
+        return snapshot is not None and snapshot.age() < self.ttl
+
+    def get(self) -> Snapshot:
+        """
+        Gibt den aktuellen Snapshot zurück und lädt ihn neu, falls keiner existiert oder er abgelaufen ist.
+        Gleichzeitige Aufrufer warten auf dasselbe Laden, es wird nur einmal geladen.
+        Läuft ein SnapshotRefresher, wird auch ein abgelaufener Snapshot sofort zurückgegeben,
+        der nächste Stand kommt dann aus dem Hintergrund. Nur der allererste Aufruf wartet aufs Laden.
+        """
+        snapshot = self._snapshot
+        if self.is_fresh(snapshot):
+            return snapshot
+        if snapshot is not None and self.refresher is not None and self.refresher.is_alive():
+            return snapshot
+        return self._loading.do('snapshot', self._load)
+
+    def _load(self) -> Snapshot:
+        # Ein anderer Aufrufer hat evtl. gerade erst geladen
+        snapshot = self._snapshot
+        if self.is_fresh(snapshot):
+            return snapshot
+        return self.publish(self.loader())
+
+    def publish(self, data: list) -> Snapshot:
+        """
+        Veröffentlicht einen neuen Datenstand als nächste Version. Das Ersetzen der Referenz ist atomar,
+        Leser sehen entweder den alten oder den neuen Snapshot, nie einen halb fertigen.
+        """
+        with self._lock:
+            version = self._snapshot.version + 1 if self._snapshot is not None else 1
+            self._snapshot = Snapshot(version=version, data=data)
+            return self._snapshot
+
+
+class SnapshotRefresher:
+    def __init__(self, store: SnapshotStore, sources: dict):
+        """
+        Aktualisiert den Snapshot eines SnapshotStore in einem Hintergrund-Thread, damit keine Session
+        auf den FROST-Server warten muss.
+
+        store: SnapshotStore, in dem die neuen Stände veröffentlicht werden
+        sources: {name: (interval, update)} je Datenquelle. interval in Sekunden,
+                 update(data) bekommt die Daten des aktuellen Snapshots (oder None) und gibt einen
+                 neuen Datenstand zurück oder None, wenn sich nichts geändert hat.
+                 update darf data nicht verändern, sondern muss geänderte Teile kopieren.
+        """
+        self.store = store
+        self.sources = sources
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "SnapshotRefresher":
+        """
+        Startet den Hintergrund-Thread (Daemon, endet mit dem Prozess).
+        """
+        if self.is_alive():
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="snapshot-refresher", daemon=True)
+        self._thread.start()
+        self.store.refresher = self
+        return self
+
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Beendet den Hintergrund-Thread nach der gerade laufenden Aktualisierung.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        if self.store.refresher is self:
+            self.store.refresher = None
+
+    def is_alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def run_source(self, name: str) -> Optional[Snapshot]:
+        """
+        Führt die Aktualisierung einer Datenquelle einmal aus und veröffentlicht das Ergebnis.
+        Rückgabe: der neue Snapshot oder None, wenn sich nichts geändert hat.
+        """
+        _, update = self.sources[name]
+        current = self.store.current()
+        data = update(current.data if current is not None else None)
+        if data is None:
+            return None
+        return self.store.publish(data)
+
+    def _run(self):
+        next_run = {name: time.time() + interval for name, (interval, _) in self.sources.items()}
+        while next_run and not self._stop.is_set():
+            now = time.time()
+            for name in sorted(next_run, key=next_run.get):
+                if next_run[name] > now:
+                    continue
+                try:
+                    snapshot = self.run_source(name)
+                    if snapshot is not None:
+                        print(f"Snapshot v{snapshot.version} veröffentlicht ({name})")
+                except Exception as e:
+                    # Alter Stand bleibt gültig, beim nächsten Intervall erneut versuchen
+                    print(f"Aktualisierung '{name}' fehlgeschlagen: {e}")
+                next_run[name] = time.time() + self.sources[name][0]
+            self._stop.wait(max(0.0, min(next_run.values()) - time.time()))
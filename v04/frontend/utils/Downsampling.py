@@ -0,0 +1,100 @@
+import numpy as np
+
+# Punkte pro Pixel Plotbreite: min/max liefert je Bucket zwei Punkte, mehr ist auf dem Bildschirm nicht sichtbar
+POINTS_PER_PIXEL = 2
+# Untergrenze, damit auch schmale Plots noch genug Details zeigen
+MIN_POINTS = 500
+
+
+def point_budget(width_px: int, points_per_pixel: float = POINTS_PER_PIXEL) -> int:
+    """
+    Anzahl Punkte, die ein Trace bei einer Plotbreite von width_px Pixeln höchstens braucht.
+    """
+    return max(MIN_POINTS, int(width_px * points_per_pixel))
+
+
+def _buckets(values: np.ndarray, n_buckets: int, fill: float) -> tuple:
+    """
+    Teilt values in n_buckets gleich große Buckets (Matrix n_buckets x size), der Rest wird mit fill aufgefüllt.
+    """
+    size = -(-len(values) // n_buckets)
+    padded = np.full(n_buckets * size, fill, dtype=np.float64)
+    padded[:len(values)] = values
+    return padded.reshape(n_buckets, size), size
+
+
+def minmax_indices(values: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Indizes für min/max-Downsampling: teilt die Reihe in max_points // 2 Buckets und behält je Bucket
+    den kleinsten und größten Wert (in zeitlicher Reihenfolge) sowie den ersten und letzten Punkt.
+    Spitzen und Ausreißer bleiben so sichtbar. NaN zählt weder als Minimum noch als Maximum.
+    """
+    n = len(values)
+    if n <= max_points:
+        return np.arange(n)
+    n_buckets = max(1, (max_points - 2) // 2)
+    lows, size = _buckets(np.where(np.isnan(values), np.inf, values), n_buckets, np.inf)
+    highs, _ = _buckets(np.where(np.isnan(values), -np.inf, values), n_buckets, -np.inf)
+
+    offsets = np.arange(n_buckets) * size
+    indices = np.concatenate([
+        [0, n - 1],
+        offsets + np.argmin(lows, axis=1),
+        offsets + np.argmax(highs, axis=1),
+    ])
+    # Aufgefüllte Buckets am Ende können auf Positionen hinter der Reihe zeigen
+    return np.unique(indices[indices < n])
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, max_points: int) -> np.ndarray:
+    """
+    Indizes für Largest-Triangle-Three-Buckets: wählt je Bucket den Punkt, der mit dem zuvor gewählten
+    Punkt und dem Mittelwert des nächsten Buckets das größte Dreieck bildet. Erhält die Form der Kurve
+    mit einem Punkt pro Bucket. x muss aufsteigend sortiert sein, NaN-Werte in y werden übersprungen.
+    """
+    finite = np.flatnonzero(~np.isnan(y))
+    n = len(finite)
+    if n <= max_points or max_points < 3:
+        return finite
+    x = x[finite].astype(np.float64)
+    y = y[finite]
+
+    # Gleich große Buckets über alle Punkte außer dem ersten und letzten
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    # Mittelwerte aller Buckets auf einmal (für den jeweils nächsten Bucket)
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    mean_x = np.append(sums_x / counts, x[-1])
+    mean_y = np.append(sums_y / counts, y[-1])
+
+    selected = np.empty(max_points, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        # Doppelte Dreiecksfläche für alle Kandidaten des Buckets auf einmal
+        areas = np.abs(
+            (x[a] - mean_x[i + 1]) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (mean_y[i + 1] - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return finite[selected]
+
+
+def downsample(times: np.ndarray, values: np.ndarray, max_points: int, method: str = "minmax") -> tuple:
+    """
+    Reduziert eine aufsteigend sortierte Zeitreihe auf höchstens etwa max_points Punkte.
+    method: 'minmax' (Extremwerte bleiben erhalten) oder 'lttb' (Form der Kurve bleibt erhalten)
+    Rückgabe: (times, values); unverändert, wenn die Reihe schon klein genug ist.
+    """
+    if len(times) <= max_points:
+        return times, values
+    if method == "minmax":
+        indices = minmax_indices(values, max_points)
+    elif method == "lttb":
+        indices = lttb_indices(times.astype('datetime64[ns]').astype(np.int64), values, max_points)
+    else:
+        raise ValueError(f"Unbekannte Downsampling-Methode: {method}")
+    return times[indices], values[indices]
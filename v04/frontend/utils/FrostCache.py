@@ -0,0 +1,208 @@
+import os
+import re
+import time
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+# Standard-TTLs in Sekunden je Entity-Typ. Metadaten ändern sich selten, Observations ständig.
+DEFAULT_TTLS = {
+    'Things': 24 * 3600,
+    'Locations': 24 * 3600,
+    'HistoricalLocations': 24 * 3600,
+    'Sensors': 24 * 3600,
+    'ObservedProperties': 24 * 3600,
+    'Datastreams': 24 * 3600,
+    'Observations': 60,
+}
+
+ENTITY_PATTERN = re.compile('|'.join(sorted(DEFAULT_TTLS, key=len, reverse=True)))
+
+
+@dataclass
+class CacheEntry:
+    content: bytes
+    expires: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+    @property
+    def size(self) -> int:
+        return len(self.content)
+
+    def is_fresh(self) -> bool:
+        return time.time() < self.expires
+
+    def can_revalidate(self) -> bool:
+        return bool(self.etag or self.last_modified)
+
+
+class MemoryCache:
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        """
+        LRU-Cache im Arbeitsspeicher, begrenzt auf max_bytes Antwortdaten.
+        """
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: CacheEntry):
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.size -= old.size
+            self._entries[key] = entry
+            self.size += entry.size
+            # Am längsten nicht benutzte Einträge verwerfen, bis die Grenze wieder eingehalten ist
+            while self.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.size -= evicted.size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+class DiskCache:
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024):
+        """
+        LRU-Cache auf der Festplatte (eine Datei pro Antwort), begrenzt auf max_bytes.
+        Die Reihenfolge für die Verdrängung ergibt sich aus der Änderungszeit der Dateien,
+        die bei jedem Treffer aktualisiert wird. Überlebt Neustarts des Prozesses.
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        # Dateigrößen in LRU-Reihenfolge (älteste zuerst), einmalig von der Platte gelesen
+        files = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.cache')]
+        files.sort(key=os.path.getmtime)
+        self._sizes = OrderedDict((path, os.path.getsize(path)) for path in files)
+        self.size = sum(self._sizes.values())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, hashlib.sha256(key.encode()).hexdigest() + '.cache')
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        path = self._path(key)
+        with self._lock:
+            if path not in self._sizes:
+                return None
+            try:
+                with open(path, 'rb') as f:
+                    entry = pickle.load(f)
+                os.utime(path)
+            except (OSError, pickle.UnpicklingError, EOFError):
+                self._remove(path)
+                return None
+            self._sizes.move_to_end(path)
+            return entry
+
+    def set(self, key: str, entry: CacheEntry):
+        if entry.size > self.max_bytes:
+            return
+        path = self._path(key)
+        data = pickle.dumps(entry)
+        with self._lock:
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self.size -= self._sizes.pop(path, 0)
+            self._sizes[path] = len(data)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self._sizes)))
+
+    def _remove(self, path: str):
+        self.size -= self._sizes.pop(path, 0)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def clear(self):
+        with self._lock:
+            for path in list(self._sizes):
+                self._remove(path)
+
+
+class FrostCache:
+    def __init__(self, backend=None, ttls: Optional[dict] = None, default_ttl: float = 300):
+        """
+        HTTP-Antwort-Cache für FrostServerClient mit eigener Gültigkeitsdauer je Entity-Typ.
+
+        backend: MemoryCache (Standard) oder DiskCache
+        ttls: Überschreibt einzelne Werte von DEFAULT_TTLS (Sekunden je Entity-Typ)
+        default_ttl: TTL für URLs ohne bekannten Entity-Typ
+        """
+        self.backend = backend if backend is not None else MemoryCache()
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self._lock = threading.Lock()
+
+    def ttl_for(self, url: str) -> float:
+        """
+        TTL einer URL: die kürzeste TTL aller darin vorkommenden Entity-Typen (Pfad und $expand),
+        damit z.B. ein Thing mit expandierten Observations so kurz lebt wie die Observations.
+        """
+        entities = set(ENTITY_PATTERN.findall(url))
+        if not entities:
+            return self.default_ttl
+        return min(self.ttls.get(entity, self.default_ttl) for entity in entities)
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        return self.backend.get(key)
+
+    def store(self, key: str, content: bytes, headers) -> CacheEntry:
+        """
+        Legt eine Antwort inkl. ETag/Last-Modified für spätere bedingte Requests ab.
+        """
+        entry = CacheEntry(
+            content=content,
+            expires=time.time() + self.ttl_for(key),
+            etag=headers.get('ETag'),
+            last_modified=headers.get('Last-Modified'),
+        )
+        self.backend.set(key, entry)
+        return entry
+
+    def refresh(self, key: str, entry: CacheEntry) -> CacheEntry:
+        """
+        Verlängert einen Eintrag nach erfolgreicher Revalidierung (HTTP 304).
+        """
+        entry.expires = time.time() + self.ttl_for(key)
+        self.backend.set(key, entry)
+        return entry
+
+    def count(self, counter: str):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self) -> dict:
+        """
+        Gibt die Zähler und die aktuelle Größe des Caches zurück.
+        """
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidated': self.revalidated,
+            'size_bytes': self.backend.size,
+        }
@@ -1,54 +1,490 @@
 import requests
+from requests.adapters import HTTPAdapter
 from urllib.parse import urljoin
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+from itertools import islice
+import json
 from pprint import pprint
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterator
+import numpy as np
+import pandas as pd
+
+from .FrostCache import FrostCache
+from .SingleFlight import SingleFlight
+from .TimeSeries import TimeSeries
+
+
+# $select-Listen für die Abfragen der Dashboard-Pipeline
+THING_SELECT = "id,name,description"
+DATASTREAM_SELECT = "id,name,description,unitOfMeasurement,phenomenonTime"
+OBSERVATION_SELECT = "phenomenonTime,result"
+
+# Gemeinsam für alle Clients im Prozess: gleichzeitige Requests auf dieselbe URL laufen nur einmal
+IN_FLIGHT = SingleFlight()
+
+# UCUM-Codes, die im Dashboard mit einem anderen Symbol angezeigt werden
+UNIT_SYMBOLS = {"Cel": "°C"}
+
+# Datastreams, die nur die Position eines Things liefern
+POSITION_DATASTREAM_FILTER = "substringof('latitude', tolower(name)) or substringof('longitude', tolower(name))"
+
+
+def odata_time(time: pd.Timestamp) -> str:
+    """
+    Formatiert einen (UTC-)Zeitpunkt als ISO-Literal für $filter-Ausdrücke.
+    """
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+
+def utc_naive(time) -> pd.Timestamp:
+    """
+    Wandelt einen Zeitpunkt in einen pd.Timestamp in UTC ohne Zeitzone um (wie in den Observations).
+    """
+    time = pd.Timestamp(time)
+    return time.tz_convert('UTC').tz_localize(None) if time.tzinfo is not None else time
+
+
+def odata_params(params: Optional[Dict[str, Any]] = None, select=None, filter: Optional[str] = None,
+                 orderby: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Ergänzt params um $select, $filter und $orderby. select darf ein String oder eine Liste sein.
+    """
+    params = dict(params or {})
+    if select:
+        params["$select"] = select if isinstance(select, str) else ",".join(select)
+    if filter:
+        params["$filter"] = filter
+    if orderby:
+        params["$orderby"] = orderby
+    return params
+
+
+def stable_orderby(orderby: Optional[str]) -> str:
+    """
+    Ergänzt $orderby um die @iot.id (OData: 'id') als letzte Sortierstufe. Nur so ist die Reihenfolge bei
+    gleichen Werten (z.B. gleicher phenomenonTime) eindeutig und $skip-Seiten überschneiden sich nicht.
+    """
+    if not orderby:
+        return "id asc"
+    keys = [part.split()[0] for part in orderby.split(",") if part.strip()]
+    return orderby if "id" in keys else f"{orderby},id asc"
+
+
+def exclude_names_filter(names: list) -> str:
+    """
+    $filter-Ausdruck, der alle Entities mit einem der gegebenen Namen ausschließt.
+    """
+    quoted = ("'" + name.replace("'", "''") + "'" for name in names)
+    return " and ".join(f"name ne {name}" for name in quoted)
+
+
+def observations_to_arrays(observations: list) -> tuple:
+    """
+    Wandelt eine Seite Observations in zwei NumPy-Arrays um:
+    times (datetime64[ns], UTC ohne Zeitzone) und values (float64, ungültige Werte als NaN).
+    """
+    times = pd.to_datetime(
+        [obs['phenomenonTime'] for obs in observations], errors="coerce", format="ISO8601", utc=True
+    ).tz_localize(None).to_numpy(dtype='datetime64[ns]')
+    values = pd.to_numeric(
+        pd.Series([obs['result'] for obs in observations], dtype=object), errors="coerce"
+    ).to_numpy(dtype=np.float64)
+    return times, values
+
+
+def observations_to_series(observations: list) -> TimeSeries:
+    """
+    Wandelt eine Liste von Observations (beliebig sortiert) in eine TimeSeries um.
+    """
+    return TimeSeries(*observations_to_arrays(observations))
+
+
+def decode_data_array(blocks: list) -> tuple:
+    """
+    Dekodiert die 'value'-Liste einer $resultFormat=dataArray-Antwort direkt in
+    times (datetime64[ns], UTC ohne Zeitzone) und values (float64), ohne Zwischenschritt über dicts.
+    """
+    times = []
+    values = []
+    for block in blocks:
+        rows = block.get('dataArray', [])
+        if not rows:
+            continue
+        components = block['components']
+        # Zeilen in Spalten umdrehen (zip läuft in C statt pro Zeile in Python)
+        columns = list(zip(*rows))
+        times.extend(columns[components.index('phenomenonTime')])
+        values.extend(columns[components.index('result')])
+
+    times = pd.to_datetime(times, errors="coerce", format="ISO8601", utc=True)
+    times = times.tz_localize(None).to_numpy(dtype='datetime64[ns]')
+    values = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce").to_numpy(dtype=np.float64)
+    return times, values
+
+
+def count_page_items(page: list) -> int:
+    """
+    Anzahl der Objekte einer Seite, auch für $resultFormat=dataArray (Summe der Zeilen aller Blöcke).
+    """
+    if page and 'dataArray' in page[0]:
+        return sum(len(block['dataArray']) for block in page)
+    return len(page)
+
+
+def unit_symbol(symbol: str | None) -> str:
+    """
+    Anzeigbares Einheitensymbol, z.B. UCUM 'Cel' -> '°C'.
+    """
+    return UNIT_SYMBOLS.get(symbol, symbol) if symbol else ""
+
+
+def datastream_to_dict(datastream: dict, observations: list) -> dict:
+    """
+    Baut den Datastream-Eintrag eines thing_dicts inkl. Observations (als TimeSeries).
+    Einheitensymbole werden dabei mit unit_symbol() normalisiert (z.B. 'Cel' -> '°C').
+    """
+    unit = dict(datastream.get('unitOfMeasurement') or {})
+    if unit.get('symbol'):
+        unit['symbol'] = unit_symbol(unit['symbol'])
+
+    return {
+        "name": datastream["name"],
+        "id": datastream["@iot.id"],
+        "description": datastream.get("description", ""),
+        'unitOfMeasurement': unit,
+        # Zeitraum aller Observations auf dem Server ('start/end'), z.B. für "All Data"
+        "phenomenonTime": datastream.get("phenomenonTime"),
+        "observations": observations_to_series(observations),
+    }
+
+
+def is_position_datastream(datastream: dict) -> bool:
+    """
+    True für Datastreams, die nur die Position (latitude/longitude) eines Things liefern.
+    """
+    name = datastream['name'].lower()
+    return 'latitude' in name or 'longitude' in name
+
+
+def locations_from_datastreams(datastreams: list) -> list:
+    """
+    Baut eine Location aus dem jeweils neuesten Wert der latitude/longitude-Datastreams.
+    Die Datastreams müssen ihre Observations unter 'Observations' enthalten.
+    """
+    latitudes = []
+    longitudes = []
+    for datastream in datastreams:
+        observations = datastream.get('Observations')
+        if not observations:
+            continue
+        if 'latitude' in datastream['name'].lower():
+            latitudes.append(observations[0]['result'])
+        if 'longitude' in datastream['name'].lower():
+            longitudes.append(observations[0]['result'])
+
+    if not latitudes or not longitudes:
+        return []
+    # make list[longitude, latitude]
+    return [{'location': {'type': 'Point', 'coordinates': [longitudes[0], latitudes[0]]}}]
+
+
+def build_thing_dict(thing: dict, locations: list, datastreams: list) -> dict:
+    """
+    Baut ein thing_dict (Format von StreamlitApp.preload_data) aus einem Thing, seinen
+    Locations und seinen Datastreams inkl. 'Observations'.
+    """
+    # Check in Datastreams for locations if not found in Locations
+    if not locations:
+        locations = locations_from_datastreams(datastreams)
+
+    return {
+        "name": thing["name"],
+        "description": thing.get("description", ""),
+        "@iot.id": thing["@iot.id"],
+        "locations": locations,
+        'datastreams': [
+            datastream_to_dict(datastream, datastream['Observations'])
+            for datastream in datastreams
+            if not is_position_datastream(datastream) and datastream['Observations']
+        ],
+    }
+
+
+def apply_name_replacements(thing_dicts: list, replacements: dict) -> list:
+    """
+    Ersetzt Thing-Namen, die einen Schlüssel aus replacements enthalten, durch den zugehörigen Wert.
+    """
+    for thing_dict in thing_dicts:
+        for key, value in replacements.items():
+            if key in thing_dict["name"]:
+                thing_dict["name"] = value
+                break
+    return thing_dicts
+
 
 class FrostServerClient:
-    def __init__(self, base_url: str):
+    def __init__(self, base_url: str, pool_size: int = 16, timeout: float = 30,
+                 cache: Optional[FrostCache] = None, single_flight: Optional[SingleFlight] = None):
         """
         base_url: z.B. 'https://timeseries.geomar.de/soop/FROST-Server/v1.1/'
+        pool_size: Anzahl offener Keep-Alive-Verbindungen zum Server. Sollte mindestens
+                   so groß sein wie die Anzahl paralleler Worker, die den Client nutzen.
+        timeout: Timeout in Sekunden pro Request.
+        cache: optionaler FrostCache; kann von mehreren Clients gemeinsam genutzt werden.
+        single_flight: fasst gleichzeitige Requests auf dieselbe URL zusammen, Standard: IN_FLIGHT
         """
         if not base_url.endswith('/'):
             base_url += '/'
         self.base_url = base_url
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.cache = cache
+        self.single_flight = single_flight if single_flight is not None else IN_FLIGHT
 
-    def get_entities(self, entity_type: str, params: Optional[Dict[str, Any]] = None) -> list:
+        # Eine gemeinsame Session hält die TCP/TLS-Verbindungen offen, statt für jeden
+        # Request einen neuen Handshake zu machen. Session ist für parallele GETs aus
+        # mehreren Threads nutzbar, solange sie nicht umkonfiguriert wird.
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def close(self):
+        """
+        Schließt alle offenen Verbindungen der Session.
+        """
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _get_json(self, url: str, params: Optional[Dict[str, Any]] = None) -> dict:
+        """
+        Führt einen GET-Request aus und gibt die JSON-Antwort zurück.
+        Gleichzeitige Aufrufe mit derselben URL (auch aus anderen Clients) warten auf einen
+        gemeinsamen Request und bekommen dieselbe Antwort.
+        """
+        key = requests.Request('GET', url, params=params).prepare().url
+        content = self.single_flight.do(key, lambda: self._fetch(key))
+        # Jeder Aufrufer dekodiert selbst, damit die Objekte gefahrlos verändert werden können
+        return json.loads(content)
+
+    def _fetch(self, url: str) -> bytes:
+        """
+        Lädt eine URL und gibt den Body zurück.
+        Mit Cache werden frische Antworten lokal beantwortet und abgelaufene, wenn möglich,
+        per If-None-Match/If-Modified-Since revalidiert.
+        """
+        if self.cache is None:
+            response = self.session.get(url, timeout=self.timeout)
+            response.raise_for_status()
+            return response.content
+
+        entry = self.cache.get(url)
+        if entry is not None and entry.is_fresh():
+            self.cache.count('hits')
+            return entry.content
+
+        headers = {}
+        if entry is not None and entry.can_revalidate():
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304 and entry is not None:
+            self.cache.count('revalidated')
+            self.cache.refresh(url, entry)
+            return entry.content
+
+        self.cache.count('misses')
+        response.raise_for_status()
+        self.cache.store(url, response.content, response.headers)
+        return response.content
+
+    def get_entities(self, entity_type: str, params: Optional[Dict[str, Any]] = None,
+                     select=None, filter: Optional[str] = None, orderby: Optional[str] = None) -> list:
         """
         entity_type: 'Things', 'Datastreams', 'Observations', 'Locations', etc.
         params: Optional: Dictionary mit OData-Parametern wie $filter, $expand, $top, etc.
+        select, filter, orderby: Kurzform für $select (str oder Liste), $filter und $orderby
         Rückgabe: Liste mit Objekten (dicts)
         """
         url = urljoin(self.base_url, entity_type)
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        data = response.json()
+        data = self._get_json(url, params=odata_params(params, select, filter, orderby))
         return data.get('value', [])
         
-    def get_all_paginated(self, entity_type: str, params: Optional[Dict[str, Any]] = None) -> list:
+    def iter_pages(self, entity_type: str, params: Optional[Dict[str, Any]] = None,
+                   select=None, filter: Optional[str] = None, orderby: Optional[str] = None) -> Iterator[list]:
         """
-        Holt alle Daten einer Entität, auch wenn sie über mehrere Seiten verteilt sind.
+        Liefert die Seiten einer Entität nacheinander, indem es @iot.nextLink folgt.
+        Es liegt immer nur eine Seite im Speicher.
         """
-        if params is None:
-            params = {}  # Standardwert setzen, falls params None ist
         url = urljoin(self.base_url, entity_type)
-        results = []
+        params = odata_params(params, select, filter, orderby)
         while url:
-            response = requests.get(url, params=params)
-            response.raise_for_status()
-            data = response.json()
-            results.extend(data.get('value', []))
+            data = self._get_json(url, params=params)
+            yield data.get('value', [])
             url = data.get('@iot.nextLink', None)
             params = None  # nur beim ersten Request nötig
-        return results
-        
 
-    def get_observations_for_datastream(self, datastream_id: int, top: int = 100) -> list:
+    def iter_entities(self, entity_type: str, params: Optional[Dict[str, Any]] = None,
+                      select=None, filter: Optional[str] = None, orderby: Optional[str] = None) -> Iterator[dict]:
+        """
+        Liefert die Objekte einer Entität einzeln über alle Seiten hinweg.
         """
-        Holt die letzten 'top' Beobachtungen eines bestimmten Datastreams.
+        for page in self.iter_pages(entity_type, params=params, select=select, filter=filter, orderby=orderby):
+            yield from page
+
+    def get_all_paginated(self, entity_type: str, params: Optional[Dict[str, Any]] = None,
+                          select=None, filter: Optional[str] = None, orderby: Optional[str] = None) -> list:
         """
+        Holt alle Daten einer Entität, auch wenn sie über mehrere Seiten verteilt sind.
+        Für große Datenmengen besser iter_pages() bzw. iter_observation_arrays() verwenden.
+        """
+        return list(self.iter_entities(entity_type, params=params, select=select, filter=filter, orderby=orderby))
+
+    def iter_pages_parallel(self, entity_type: str, params: Optional[Dict[str, Any]] = None, select=None,
+                            filter: Optional[str] = None, orderby: str = "id asc", page_size: int = 1000,
+                            max_workers: Optional[int] = None, window: Optional[int] = None) -> Iterator[list]:
+        """
+        Wie iter_pages, lädt die Seiten aber parallel über $skip statt nacheinander über @iot.nextLink.
+        Die erste Anfrage ($count=true) liefert die Gesamtanzahl und die erste Seite. Danach sind höchstens
+        'window' $skip-Offsets gleichzeitig angefragt. Jede Seite wird geliefert, sobald sie und alle
+        vorherigen fertig sind, es liegen also nie mehr als window Seiten im Speicher.
+        orderby: wird um die @iot.id ergänzt (siehe stable_orderby), damit sich Seiten nicht überschneiden.
+        page_size: gewünschte Seitengröße; begrenzt der Server $top stärker, wird dessen Größe verwendet.
+        max_workers: Anzahl paralleler Requests (Standard: pool_size)
+        window: Anzahl vorausgeladener Seiten (Standard: 2 * max_workers)
+        """
+        url = urljoin(self.base_url, entity_type)
+        params = odata_params(params, select, filter, stable_orderby(orderby))
+        first = self._get_json(url, params={**params, "$top": page_size, "$count": "true"})
+        first_page = first.get('value', [])
+        yield first_page
+
+        total = first.get('@iot.count', 0)
+        step = count_page_items(first_page)
+        if step == 0 or step >= total:
+            return
+
+        def fetch(skip: int) -> list:
+            return self._get_json(url, params={**params, "$top": step, "$skip": skip}).get('value', [])
+
+        max_workers = max_workers or self.pool_size
+        window = max(1, window or 2 * max_workers)
+        offsets = iter(range(step, total, step))
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            pending = deque(pool.submit(fetch, skip) for skip in islice(offsets, window))
+            try:
+                while pending:
+                    # In der Reihenfolge der Offsets liefern, für jede fertige Seite die nächste anfragen
+                    page = pending.popleft().result()
+                    for skip in islice(offsets, 1):
+                        pending.append(pool.submit(fetch, skip))
+                    yield page
+            finally:
+                # Bricht der Aufrufer ab, keine weiteren Seiten mehr laden
+                for future in pending:
+                    future.cancel()
+
+    def get_all_parallel(self, entity_type: str, params: Optional[Dict[str, Any]] = None, select=None,
+                         filter: Optional[str] = None, orderby: str = "id asc", page_size: int = 1000,
+                         max_workers: Optional[int] = None) -> list:
+        """
+        Wie get_all_paginated, aber mit parallel geladenen Seiten (siehe iter_pages_parallel).
+        """
+        pages = self.iter_pages_parallel(
+            entity_type, params=params, select=select, filter=filter, orderby=orderby,
+            page_size=page_size, max_workers=max_workers,
+        )
+        return [entity for page in pages for entity in page]
+
+    def iter_observation_arrays(self, datastream_id: int, params: Optional[Dict[str, Any]] = None,
+                                filter: Optional[str] = None, orderby: str = "phenomenonTime asc",
+                                result_format: Optional[str] = "dataArray", max_workers: int = 1,
+                                page_size: int = 1000) -> Iterator[tuple]:
+        """
+        Lädt alle Observations eines Datastreams seitenweise und liefert jede Seite als
+        NumPy-Chunk (times: datetime64[ns], values: float64). Standardmäßig aufsteigend sortiert.
+        result_format: 'dataArray' (kompakt, Standard) oder None für ein JSON-Objekt pro Observation.
+        max_workers: > 1 lädt die Seiten parallel über $skip (siehe iter_pages_parallel)
+        page_size: Seitengröße ($top) je Anfrage, auch beim sequenziellen Laden über @iot.nextLink
+        """
+        params = dict(params or {})
+        # Ohne $top liefert FROST nur seine Standard-Seitengröße (meist 100 Observations je Request)
+        params.setdefault("$top", page_size)
+        if result_format:
+            params["$resultFormat"] = result_format
         entity = f"Datastreams({datastream_id})/Observations"
-        params = {"$top": top, "$orderby": "phenomenonTime desc"}
-        return self.get_entities(entity, params=params)
+        orderby = stable_orderby(orderby)
+        if max_workers > 1:
+            pages = self.iter_pages_parallel(
+                entity, params=params, select=OBSERVATION_SELECT, filter=filter, orderby=orderby,
+                page_size=page_size, max_workers=max_workers,
+            )
+        else:
+            pages = self.iter_pages(entity, params=params, select=OBSERVATION_SELECT, filter=filter, orderby=orderby)
+        decode = decode_data_array if result_format == "dataArray" else observations_to_arrays
+        for page in pages:
+            yield decode(page)
+
+    def get_observations(self, datastream_id: int, start, end=None, window: str = "MS",
+                         max_workers: Optional[int] = None) -> tuple:
+        """
+        Holt alle Observations eines Datastreams im Zeitraum [start, end) ohne Zeilenlimit.
+        Der Zeitraum wird an festen Fenstergrenzen geteilt (window als pandas-Frequenz, Standard:
+        Monatsanfang). Die Fenster werden parallel geladen und in zeitlicher Reihenfolge zusammengesetzt.
+        start, end: Zeitpunkte (ohne Zeitzone = UTC), end Standard: jetzt
+        max_workers: Anzahl parallel geladener Fenster (Standard: pool_size)
+        Rückgabe: (times: datetime64[ns], values: float64), aufsteigend sortiert
+        """
+        start = utc_naive(start)
+        end = utc_naive(pd.Timestamp.now(tz='UTC') if end is None else end)
+        if start >= end:
+            return np.array([], dtype='datetime64[ns]'), np.array([], dtype=np.float64)
+
+        bounds = [start, *pd.date_range(start, end, freq=window, inclusive="neither"), end]
+
+        def fetch(lower: pd.Timestamp, upper: pd.Timestamp) -> list:
+            return list(self.iter_observation_arrays(
+                datastream_id,
+                filter=f"phenomenonTime ge {odata_time(lower)} and phenomenonTime lt {odata_time(upper)}",
+            ))
+
+        with ThreadPoolExecutor(max_workers=max_workers or self.pool_size) as pool:
+            windows = list(pool.map(fetch, bounds[:-1], bounds[1:]))
+
+        chunks = [chunk for window_chunks in windows for chunk in window_chunks]
+        if not chunks:
+            return np.array([], dtype='datetime64[ns]'), np.array([], dtype=np.float64)
+        return np.concatenate([times for times, _ in chunks]), np.concatenate([values for _, values in chunks])
+
+    def get_observations_for_datastream(self, datastream_id: int, top: int = 100, select=None,
+                                        filter: Optional[str] = None, orderby: str = "phenomenonTime desc") -> list:
+        """
+        Holt die letzten 'top' Beobachtungen eines bestimmten Datastreams (ein dict pro Observation).
+        select: z.B. OBSERVATION_SELECT, um nur phenomenonTime und result zu laden.
+        """
+        entity = f"Datastreams({datastream_id})/Observations"
+        return self.get_entities(entity, params={"$top": top}, select=select, filter=filter, orderby=orderby)
+
+    def get_observation_arrays(self, datastream_id: int, top: int = 100, filter: Optional[str] = None,
+                               orderby: str = "phenomenonTime desc") -> tuple:
+        """
+        Holt die letzten 'top' Beobachtungen eines Datastreams in der kompakten Darstellung
+        ($resultFormat=dataArray, immer mit OBSERVATION_SELECT).
+        Rückgabe: Tupel (times: datetime64[ns], values: float64), siehe decode_data_array.
+        """
+        entity = f"Datastreams({datastream_id})/Observations"
+        params = {"$top": top, "$resultFormat": "dataArray"}
+        blocks = self.get_entities(entity, params=params, select=OBSERVATION_SELECT, filter=filter, orderby=orderby)
+        return decode_data_array(blocks)
 
     def get_thing_with_datastreams(self, thing_id: int) -> dict:
         """
@@ -59,22 +495,106 @@ class FrostServerClient:
         result = self.get_entities(entity, params=params)
         return result[0] if result else {}
 
-    def list_things(self) -> list:
+    @staticmethod
+    def thing_graph_expand(top: int) -> str:
+        """
+        $expand-Ausdruck für ein Thing inkl. Locations, Datastreams und deren letzten 'top' Observations.
+        Positions-Datastreams (latitude/longitude) werden serverseitig herausgefiltert.
+        """
+        observations = f"Observations($top={top};$orderby=phenomenonTime desc;$select={OBSERVATION_SELECT})"
+        datastreams = (
+            f"Datastreams($filter=not ({POSITION_DATASTREAM_FILTER});"
+            f"$select={DATASTREAM_SELECT};$expand={observations})"
+        )
+        return f"Locations,{datastreams}"
+
+    def _follow_next_links(self, entity: dict, navigation: str, limit: Optional[int] = None) -> list:
+        """
+        Gibt die expandierte Collection 'navigation' eines Entities zurück. Ist sie vom Server
+        abgeschnitten worden (navigation@iot.nextLink), werden die restlichen Seiten nachgeladen,
+        höchstens bis 'limit' Einträge erreicht sind.
+        """
+        items = list(entity.get(navigation, []))
+        url = entity.get(f'{navigation}@iot.nextLink')
+        while url and (limit is None or len(items) < limit):
+            data = self._get_json(url)
+            items.extend(data.get('value', []))
+            url = data.get('@iot.nextLink')
+        return items if limit is None else items[:limit]
+
+    def load_thing_graph(self, thing_id: Optional[int] = None, top: int = 100,
+                         params: Optional[Dict[str, Any]] = None, filter: Optional[str] = None) -> list:
+        """
+        Lädt Things zusammen mit Locations, Datastreams und den letzten 'top' Observations
+        je Datastream in einer einzigen verschachtelten $expand-Abfrage.
+        thing_id: nur dieses Thing laden, sonst alle Things (seitenweise).
+        params: zusätzliche OData-Parameter für die Things-Abfrage.
+        filter: $filter für die Things-Abfrage, z.B. exclude_names_filter(SKIP_THINGS)
+        Rückgabe: Liste von thing_dicts im Format von StreamlitApp.preload_data
+        """
+        params = odata_params(params, THING_SELECT, filter, None)
+        params["$expand"] = self.thing_graph_expand(top)
+        if thing_id is None:
+            things = self.get_all_paginated("Things", params=params)
+        else:
+            things = [self._get_json(urljoin(self.base_url, f"Things({thing_id})"), params=params)]
+        return [self._thing_graph_to_dict(thing, top) for thing in things]
+
+    def _thing_graph_to_dict(self, thing: dict, top: int) -> dict:
+        """
+        Wandelt ein expandiertes Thing in ein thing_dict um und lädt abgeschnittene Collections nach.
+        """
+        locations = self._follow_next_links(thing, 'Locations')
+        datastreams = self._follow_next_links(thing, 'Datastreams')
+        for datastream in datastreams:
+            if 'Observations' in datastream:
+                datastream['Observations'] = self._follow_next_links(datastream, 'Observations', limit=top)
+            else:
+                # Datastreams aus nachgeladenen Seiten haben evtl. keine expandierten Observations
+                datastream['Observations'] = self.get_observations_for_datastream(
+                    datastream['@iot.id'], top=top, select=OBSERVATION_SELECT
+                )
+
+        # Check in Datastreams for locations if not found in Locations
+        if not locations:
+            locations = locations_from_datastreams(self.get_position_datastreams(thing["@iot.id"]))
+
+        return build_thing_dict(thing, locations, datastreams)
+
+    def get_position_datastreams(self, thing_id: int) -> list:
+        """
+        Gibt die latitude/longitude-Datastreams eines Things inkl. ihrer neuesten Observation zurück.
+        """
+        return self.get_entities(
+            f"Things({thing_id})/Datastreams",
+            params={"$expand": f"Observations($top=1;$orderby=phenomenonTime desc;$select={OBSERVATION_SELECT})"},
+            select=DATASTREAM_SELECT,
+            filter=POSITION_DATASTREAM_FILTER,
+        )
+
+    def list_things(self, select=None, filter: Optional[str] = None, orderby: Optional[str] = None) -> list:
         """
         Gibt eine Liste aller Things zurück.
         """
-        return self.get_all_paginated("Things")
+        return self.get_all_paginated("Things", select=select, filter=filter, orderby=orderby)
 
-    def list_datastreams(self) -> list:
+    def list_datastreams(self, select=None, filter: Optional[str] = None, orderby: Optional[str] = None) -> list:
         """
         Gibt eine Liste aller Datastreams zurück.
         """
-        return self.get_all_paginated("Datastreams")
+        return self.get_all_paginated("Datastreams", select=select, filter=filter, orderby=orderby)
 
+    def count_entities(self, entity_type: str, filter: Optional[str] = None) -> int:
+        """
+        Gibt die Anzahl der Entities zurück ($count=true&$top=0, es werden keine Daten übertragen).
+        """
+        url = urljoin(self.base_url, entity_type)
+        data = self._get_json(url, params=odata_params({"$count": "true", "$top": 0}, None, filter, None))
+        return data.get('@iot.count', 0)
 
 
 
-# Beispiel-Nutzung:
+# Beispiel-Nutzung (aus v04/frontend: python -m utils.FrostServer):
 if __name__ == "__main__":
     frost = FrostServerClient("https://timeseries.geomar.de/soop/FROST-Server/v1.1/")
     
@@ -0,0 +1,156 @@
+import threading
+from dataclasses import dataclass, field
+from importlib.metadata import PackageNotFoundError, version
+
+import folium
+import streamlit_folium
+from streamlit_folium import st_folium
+
+# streamlit_folium-Versionen, mit denen render_map / st_rendered_map getestet sind. Sie nutzen interne
+# Helfer und rufen die Komponente direkt auf; bei jeder anderen Version zeigt st_folium die Karte an.
+TESTED_STREAMLIT_FOLIUM = ("0.25.0",)
+
+
+def _installed_streamlit_folium() -> str | None:
+    try:
+        return version("streamlit-folium")
+    except PackageNotFoundError:
+        return None
+
+
+PRERENDER = _installed_streamlit_folium() in TESTED_STREAMLIT_FOLIUM
+if PRERENDER:
+    from streamlit_folium import _get_header, _get_html, _get_map_string, generate_js_hash, get_full_id
+
+# st_folium rendert die Karte bei jedem Aufruf neu, das geteilte folium-Objekt nicht parallel rendern
+_fallback_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class RenderedMap:
+    """
+    Fertig serialisierte folium-Karte (HTML, Header und Leaflet-JavaScript), wie st_folium sie an das
+    Frontend schickt. Unveränderlich, kann von allen Sessions gleichzeitig genutzt werden.
+    Ohne getestete streamlit_folium-Version (siehe PRERENDER) enthält sie nur die unveränderte
+    folium-Karte, script ist dann None.
+    """
+    folium_map: folium.Map = field(repr=False, compare=False)
+    script: str | None = None
+    header: str = ""
+    html: str = ""
+    id: str = ""
+    css_links: tuple = ()
+    js_links: tuple = ()
+    bounds: dict | None = None
+    zoom: int | None = None
+    hash_key: str = ""
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.script or "") + len(self.header) + len(self.html)
+
+
+def _bounds_to_dict(bounds: list) -> dict:
+    southwest, northeast = bounds
+    return {
+        "_southWest": {"lat": southwest[0], "lng": southwest[1]},
+        "_northEast": {"lat": northeast[0], "lng": northeast[1]},
+    }
+
+
+def _links(folium_map: folium.Map) -> tuple:
+    """
+    CSS- und JS-Abhängigkeiten aller Elemente der Karte (z.B. Leaflet.markercluster), ohne Duplikate.
+    """
+    css_links, js_links = [], []
+    elements = [folium_map]
+    while elements:
+        element = elements.pop(0)
+        css_links.extend(href for _, href in getattr(element, "default_css", []))
+        js_links.extend(src for _, src in getattr(element, "default_js", []))
+        elements.extend(getattr(element, "_children", {}).values())
+    return tuple(dict.fromkeys(css_links)), tuple(dict.fromkeys(js_links))
+
+
+def render_map(folium_map: folium.Map, key: str | None = None) -> RenderedMap:
+    """
+    Serialisiert eine folium-Karte einmal so, wie st_folium es bei jedem Rerun tun würde.
+    Das Ergebnis wird pro Snapshot gespeichert (siehe app.py), neue Sessions und Reruns zeigen dann
+    nur noch die fertigen Strings an, die Kosten hängen nicht mehr von der Anzahl der Marker ab.
+    """
+    if not PRERENDER:
+        return RenderedMap(folium_map=folium_map)
+    folium_map.get_root().render()
+    folium_map.render()
+    # Reihenfolge wie in st_folium: _get_map_string verändert die folium-Struktur
+    html = _get_html(folium_map)
+    header = _get_header(folium_map)
+    script = _get_map_string(folium_map)
+    try:
+        bounds = _bounds_to_dict(folium_map.get_bounds())
+    except (AttributeError, ValueError):
+        bounds = _bounds_to_dict([[None, None], [None, None]])
+    css_links, js_links = _links(folium_map)
+    return RenderedMap(
+        folium_map=folium_map,
+        script=script,
+        header=header,
+        html=html,
+        id=get_full_id(folium_map),
+        css_links=css_links,
+        js_links=js_links,
+        bounds=bounds,
+        zoom=folium_map.options.get("zoom"),
+        hash_key=generate_js_hash(script, key, False),
+    )
+
+
+def st_rendered_map(rendered: RenderedMap, width: int | None = 500, height: int = 700) -> dict:
+    """
+    Zeigt eine mit render_map serialisierte Karte an, gleiche Rückgabe wie st_folium
+    (last_clicked, last_object_clicked, last_object_clicked_tooltip, ...).
+    Ohne getestete streamlit_folium-Version wird die Karte über st_folium angezeigt.
+    """
+    if rendered.script is None:
+        return _st_folium_fallback(rendered, width, height)
+    defaults = {
+        "last_clicked": None,
+        "last_object_clicked": None,
+        "last_object_clicked_tooltip": None,
+        "last_object_clicked_popup": None,
+        "all_drawings": None,
+        "last_active_drawing": None,
+        "bounds": rendered.bounds,
+        "zoom": rendered.zoom,
+        "last_circle_radius": None,
+        "last_circle_polygon": None,
+        "selected_layers": None,
+    }
+    # Gleiche Komponente und Argumente wie st_folium (Version siehe oben), nur ohne erneutes Rendern der Karte
+    return streamlit_folium._component_func(
+        script=rendered.script,
+        header=rendered.header,
+        html=rendered.html,
+        id=rendered.id,
+        key=rendered.hash_key,
+        height=height,
+        width=width,
+        returned_objects=None,
+        default=defaults,
+        zoom=None,
+        center=None,
+        feature_group=None,
+        return_on_hover=False,
+        layer_control=None,
+        pixelated=False,
+        css_links=list(rendered.css_links),
+        js_links=list(rendered.js_links),
+    )
+
+
+def _st_folium_fallback(rendered: RenderedMap, width: int | None, height: int) -> dict:
+    """
+    Zeigt die Karte über das öffentliche st_folium an (rendert sie bei jedem Aufruf neu).
+    """
+    with _fallback_lock:
+        return st_folium(rendered.folium_map, width=width, height=height)
@@ -0,0 +1,137 @@
+import os
+import threading
+from collections import defaultdict
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+
+class ObservationStore:
+    def __init__(self, root: str):
+        """
+        Lokaler, dauerhafter Speicher für Observations als Parquet-Dateien.
+
+        Aufteilung: <root>/<datastream_id>/<YYYY-MM>.parquet mit den Spalten
+        time (datetime64[ns], UTC ohne Zeitzone) und value (float64), aufsteigend sortiert.
+
+        root: Verzeichnis des Speichers, wird bei Bedarf angelegt.
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        # Ein Lock pro Datastream, damit parallele appends dieselbe Monatsdatei nicht überschreiben
+        self._locks = defaultdict(threading.Lock)
+        self._locks_lock = threading.Lock()
+
+    def _lock(self, datastream_id: int) -> threading.Lock:
+        with self._locks_lock:
+            return self._locks[datastream_id]
+
+    def _path(self, datastream_id: int, month: str) -> str:
+        return os.path.join(self.root, str(datastream_id), f"{month}.parquet")
+
+    def months(self, datastream_id: int) -> list:
+        """
+        Gibt die gespeicherten Monate ('YYYY-MM') eines Datastreams aufsteigend zurück.
+        """
+        directory = os.path.join(self.root, str(datastream_id))
+        if not os.path.isdir(directory):
+            return []
+        return sorted(name[:-len(".parquet")] for name in os.listdir(directory) if name.endswith(".parquet"))
+
+    def _read_month(self, datastream_id: int, month: str) -> pd.DataFrame:
+        return pd.read_parquet(self._path(datastream_id, month))
+
+    def append(self, datastream_id: int, times: np.ndarray, values: np.ndarray, replace_range: bool = False) -> int:
+        """
+        Fügt Observations hinzu. Bereits vorhandene Zeitpunkte werden durch die neuen Werte ersetzt.
+        times: datetime64[ns] (UTC ohne Zeitzone), values: float64
+        replace_range: vorhandene Observations zwischen dem ältesten und neuesten neuen Zeitpunkt
+                       vorher löschen (z.B. nach einem kompletten Neuladen, um gelöschte Punkte zu entfernen)
+        Rückgabe: Anzahl übergebener Observations
+        """
+        times = np.asarray(times, dtype='datetime64[ns]')
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnat(times)
+        times, values = times[valid], values[valid]
+        if len(times) == 0:
+            return 0
+
+        months = times.astype('datetime64[M]').astype(str)
+        first, last = times.min(), times.max()
+        with self._lock(datastream_id):
+            os.makedirs(os.path.join(self.root, str(datastream_id)), exist_ok=True)
+            touched = set(months)
+            if replace_range:
+                # auch Monate im Zeitraum, für die keine neuen Werte mehr existieren
+                first_month, last_month = str(first.astype('datetime64[M]')), str(last.astype('datetime64[M]'))
+                touched.update(month for month in self.months(datastream_id) if first_month <= month <= last_month)
+            for month in sorted(touched):
+                mask = months == month
+                df = pd.DataFrame({'time': times[mask], 'value': values[mask]})
+                path = self._path(datastream_id, month)
+                if os.path.exists(path):
+                    existing = self._read_month(datastream_id, month)
+                    if replace_range:
+                        existing = existing[(existing['time'] < first) | (existing['time'] > last)]
+                    df = pd.concat([existing, df])
+                df = df.drop_duplicates(subset='time', keep='last').sort_values('time')
+                if df.empty:
+                    os.remove(path)
+                    continue
+
+                # Erst in eine temporäre Datei schreiben und dann umbenennen, damit Leser nie
+                # eine halb geschriebene Datei sehen
+                tmp_path = f"{path}.{threading.get_ident()}.tmp"
+                df.to_parquet(tmp_path, index=False)
+                os.replace(tmp_path, path)
+        return len(times)
+
+    def read(self, datastream_id: int, start: Optional[pd.Timestamp] = None,
+             end: Optional[pd.Timestamp] = None) -> tuple:
+        """
+        Liest die Observations im Zeitraum [start, end] (beide optional).
+        Rückgabe: (times: datetime64[ns], values: float64), aufsteigend sortiert
+        """
+        months = self.months(datastream_id)
+        if start is not None:
+            months = [month for month in months if month >= pd.Timestamp(start).strftime('%Y-%m')]
+        if end is not None:
+            months = [month for month in months if month <= pd.Timestamp(end).strftime('%Y-%m')]
+        if not months:
+            return np.array([], dtype='datetime64[ns]'), np.array([], dtype=np.float64)
+
+        df = pd.concat([self._read_month(datastream_id, month) for month in months])
+        if start is not None:
+            df = df[df['time'] >= pd.Timestamp(start)]
+        if end is not None:
+            df = df[df['time'] <= pd.Timestamp(end)]
+        return df['time'].to_numpy(dtype='datetime64[ns]'), df['value'].to_numpy(dtype=np.float64)
+
+    def read_latest(self, datastream_id: int, n: int) -> tuple:
+        """
+        Liest die neuesten n Observations, ohne ältere Monate anzufassen als nötig.
+        Rückgabe: (times: datetime64[ns], values: float64), aufsteigend sortiert
+        """
+        frames = []
+        count = 0
+        for month in reversed(self.months(datastream_id)):
+            df = self._read_month(datastream_id, month)
+            frames.append(df)
+            count += len(df)
+            if count >= n:
+                break
+        if not frames:
+            return np.array([], dtype='datetime64[ns]'), np.array([], dtype=np.float64)
+
+        df = pd.concat(reversed(frames)).iloc[-n:]
+        return df['time'].to_numpy(dtype='datetime64[ns]'), df['value'].to_numpy(dtype=np.float64)
+
+    def latest(self, datastream_id: int) -> Optional[pd.Timestamp]:
+        """
+        Gibt den neuesten gespeicherten Zeitpunkt eines Datastreams zurück oder None.
+        """
+        months = self.months(datastream_id)
+        if not months:
+            return None
+        return pd.Timestamp(self._read_month(datastream_id, months[-1])['time'].max())
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+from itertools import islice
+
+from .FrostServer import (
+    FrostServerClient, observations_to_series, odata_time, OBSERVATION_SELECT,
+)
+from .TimeSeries import TimeSeries
+from .ObservationStore import ObservationStore
+
+
+class ObservationSync:
+    def __init__(self, frost: FrostServerClient, store: ObservationStore, full_top: int = 10000):
+        """
+        Hält die Zeitreihen einzelner Datastreams im lokalen Speicher aktuell (siehe hydrate_datastream).
+
+        Der Snapshot des Dashboards enthält nur die neueste Observation je Datastream und wird komplett
+        mit load_thing_graph(top=1) neu geladen; das sind ohnehin nur eine Abfrage pro Thing.
+        Die Zeitreihen selbst werden erst bei Auswahl einer Marina abgeglichen: vom Server kommt
+        nur, was seit dem neuesten lokalen Punkt neu ist.
+
+        frost: Client für den FROST-Server
+        store: lokaler Speicher, in dem alle geladenen Observations abgelegt werden
+        full_top: Anzahl Observations bei einem kompletten Neuladen und beim Lesen aus dem Speicher
+        """
+        self.frost = frost
+        self.store = store
+        self.full_top = full_top
+        # Zeitpunkte mit mehreren Observations auf dem Server je Datastream: {Zeitpunkt: Anzahl zusätzlicher}.
+        # Der Speicher behält je Zeitpunkt nur eine, $count zählt aber alle (siehe _has_gap)
+        self.duplicates = {}
+
+    def hydrate_datastream(self, datastream: dict) -> int:
+        """
+        Füllt einen Datastream mit seinen neuesten full_top Observations aus dem lokalen Speicher.
+        Die übergebene TimeSeries muss die neueste Observation auf dem Server enthalten; nur wenn sie
+        neuer als der lokale Stand ist, wird der Server gefragt. Wurden im lokal bekannten Zeitraum
+        Punkte gelöscht oder nachgetragen, wird dieser Zeitraum neu geladen.
+        Rückgabe: Anzahl vom Server geladener Observations.
+        """
+        local_latest = self.store.latest(datastream["id"])
+        if local_latest is None:
+            self.resync(datastream)
+            return len(datastream["observations"])
+
+        fetched = 0
+        server_latest = datastream["observations"].last_time
+        if server_latest is not None and server_latest > local_latest:
+            local = TimeSeries(*self.store.read_latest(datastream["id"], self.full_top))
+            replace_range = self._has_gap(datastream["id"], local)
+            if replace_range:
+                # Ab dem ältesten lokalen Punkt neu laden und den Bereich im Speicher ersetzen
+                since = f"phenomenonTime ge {odata_time(local.first_time)}"
+            else:
+                # Nur den fehlenden Zeitraum seit dem neuesten lokalen Punkt laden
+                since = f"phenomenonTime gt {odata_time(local_latest)}"
+            chunks = list(self.frost.iter_observation_arrays(datastream["id"], filter=since))
+            if chunks:
+                times = np.concatenate([times for times, _ in chunks])
+                values = np.concatenate([values for _, values in chunks])
+                self._record_duplicates(datastream["id"], times, replace_from=local.first_time if replace_range else None)
+                # In einem Aufruf, damit replace_range den ganzen neu geladenen Zeitraum abdeckt
+                fetched = self.store.append(datastream["id"], times, values, replace_range=replace_range)
+
+        datastream["observations"] = TimeSeries(*self.store.read_latest(datastream["id"], self.full_top))
+        return fetched
+
+    def _record_duplicates(self, datastream_id: int, times: np.ndarray, replace_from: pd.Timestamp | None = None):
+        """
+        Merkt sich, welche Zeitpunkte in vom Server geladenen Observations mehrfach vorkommen.
+        replace_from: ab diesem Zeitpunkt wurde alles neu geladen, ältere Einträge ab dort verwerfen.
+        """
+        known = self.duplicates.setdefault(datastream_id, {})
+        if replace_from is not None:
+            for time in [time for time in known if time >= replace_from.to_datetime64()]:
+                del known[time]
+        unique, counts = np.unique(times, return_counts=True)
+        for time, count in zip(unique[counts > 1], counts[counts > 1]):
+            known[time] = int(count) - 1
+
+    def _has_gap(self, datastream_id: int, local: TimeSeries) -> bool:
+        """
+        Vergleicht die Anzahl der Observations im lokal bekannten Zeitraum mit dem Server.
+        Weicht sie ab, wurden Punkte gelöscht oder nachträglich eingefügt. Mehrfache Zeitpunkte,
+        die der Speicher zusammenfasst, werden dabei zur lokalen Anzahl addiert.
+        """
+        if not local:
+            return True
+        # $filter-Zeitpunkte haben Sekundengenauigkeit: Fenster auf ganze Sekunden erweitern
+        start = local.first_time.floor("s")
+        end = local.last_time.floor("s") + pd.Timedelta(seconds=1)
+        count = self.frost.count_entities(
+            f"Datastreams({datastream_id})/Observations",
+            filter=f"phenomenonTime ge {odata_time(start)} and phenomenonTime lt {odata_time(end)}",
+        )
+        start, end = start.to_datetime64(), end.to_datetime64()
+        duplicates = sum(
+            extra for time, extra in self.duplicates.get(datastream_id, {}).items() if start <= time < end
+        )
+        return count != len(local) + duplicates
+
+    def resync(self, datastream: dict):
+        """
+        Lädt die letzten full_top Observations eines Datastreams komplett neu.
+        """
+        observations = self.frost.iter_entities(
+            f"Datastreams({datastream['id']})/Observations", params={"$top": self.full_top},
+            select=OBSERVATION_SELECT, orderby="phenomenonTime desc",
+        )
+        observations = observations_to_series(list(islice(observations, self.full_top)))
+        self._record_duplicates(datastream["id"], observations.times, replace_from=observations.first_time)
+        self.store.append(datastream["id"], observations.times, observations.values, replace_range=True)
+        # Aus dem Speicher lesen, damit mehrfache Zeitpunkte wie bei hydrate_datastream zusammengefasst sind
+        datastream["observations"] = TimeSeries(*self.store.read_latest(datastream["id"], self.full_top))
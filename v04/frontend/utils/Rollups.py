@@ -0,0 +1,236 @@
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+from .TimeSeries import TimeSeries
+from .Downsampling import minmax_indices, POINTS_PER_PIXEL
+
+# Stufen der Rollup-Pyramide von fein nach grob (Bucket-Breite als pandas-Frequenz)
+ROLLUP_LEVELS = ("10min", "1h", "1D")
+
+
+def _step(freq: str) -> np.timedelta64:
+    """
+    Bucket-Breite in Nanosekunden (passend zu den datetime64[ns]-Zeitpunkten der TimeSeries).
+    """
+    return np.timedelta64(pd.Timedelta(freq).value, 'ns')
+
+
+class Rollup:
+    """
+    Eine Stufe der Pyramide: je Zeit-Bucket (Startzeitpunkt) Minimum, Mittelwert, Maximum und Anzahl
+    der gültigen Observations. Buckets ohne gültige Werte haben NaN und count 0.
+    """
+    __slots__ = ('freq', 'step', 'times', 'min', 'mean', 'max', 'count')
+
+    def __init__(self, freq: str, times: np.ndarray, min: np.ndarray, mean: np.ndarray, max: np.ndarray,
+                 count: np.ndarray):
+        self.freq = freq
+        self.step = _step(freq)
+        self.times = times
+        self.min = min
+        self.mean = mean
+        self.max = max
+        self.count = count
+
+    @classmethod
+    def from_series(cls, series: TimeSeries, freq: str) -> "Rollup":
+        """
+        Aggregiert eine (sortierte) TimeSeries vektorisiert in Buckets der Breite freq.
+        """
+        step = _step(freq)
+        values = series.values
+        keys = series.times.astype(np.int64) // step.astype(np.int64)
+        # Bucket-Grenzen: Positionen, an denen sich der Bucket-Schlüssel ändert
+        starts = np.flatnonzero(np.diff(keys, prepend=keys[:1] - 1)) if len(keys) else np.array([], dtype=np.int64)
+        if len(starts) == 0:
+            empty = np.array([], dtype=np.float64)
+            return cls(freq, np.array([], dtype='datetime64[ns]'), empty, empty, empty, np.array([], dtype=np.int64))
+
+        valid = ~np.isnan(values)
+        count = np.add.reduceat(valid.astype(np.int64), starts)
+        total = np.add.reduceat(np.where(valid, values, 0.0), starts)
+        low = np.minimum.reduceat(np.where(valid, values, np.inf), starts)
+        high = np.maximum.reduceat(np.where(valid, values, -np.inf), starts)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(count > 0, total / count, np.nan)
+        low[count == 0] = np.nan
+        high[count == 0] = np.nan
+        times = (keys[starts] * step.astype(np.int64)).astype('datetime64[ns]')
+        return cls(freq, times, low, mean, high, count)
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def extend(self, newer: "Rollup") -> "Rollup":
+        """
+        Hängt die Buckets einer Rollup-Stufe mit neueren Observations an. Überlappt der erste neue Bucket
+        mit dem letzten vorhandenen, werden beide zusammengeführt. Gibt eine neue Stufe zurück.
+        """
+        if len(newer) == 0:
+            return self
+        if len(self) == 0:
+            return newer
+        head = self
+        first = newer
+        if self.times[-1] == newer.times[0]:
+            count = self.count[-1] + newer.count[0]
+            total = np.nansum([self.mean[-1] * self.count[-1], newer.mean[0] * newer.count[0]])
+            merged = Rollup(
+                self.freq, newer.times[:1],
+                np.array([np.fmin(self.min[-1], newer.min[0])]),
+                np.array([total / count if count else np.nan]),
+                np.array([np.fmax(self.max[-1], newer.max[0])]),
+                np.array([count]),
+            )
+            head = self._slice(0, len(self) - 1)
+            first = merged.concat(newer._slice(1, len(newer)))
+        return head.concat(first)
+
+    def concat(self, other: "Rollup") -> "Rollup":
+        return Rollup(
+            self.freq,
+            np.concatenate([self.times, other.times]),
+            np.concatenate([self.min, other.min]),
+            np.concatenate([self.mean, other.mean]),
+            np.concatenate([self.max, other.max]),
+            np.concatenate([self.count, other.count]),
+        )
+
+    def _slice(self, lower: int, upper: int) -> "Rollup":
+        return Rollup(
+            self.freq, self.times[lower:upper], self.min[lower:upper], self.mean[lower:upper],
+            self.max[lower:upper], self.count[lower:upper],
+        )
+
+    def _take(self, indices: np.ndarray) -> "Rollup":
+        return Rollup(
+            self.freq, self.times[indices], self.min[indices], self.mean[indices],
+            self.max[indices], self.count[indices],
+        )
+
+    def window(self, start: Optional[pd.Timestamp] = None, end: Optional[pd.Timestamp] = None) -> "Rollup":
+        """
+        Buckets, die den Zeitraum [start, end] berühren, per binärer Suche (NumPy-Views).
+        """
+        lower = 0
+        if start is not None:
+            start = pd.Timestamp(start).to_datetime64()
+            # Bucket, in den start fällt, gehört noch dazu
+            lower = np.searchsorted(self.times, start, side='right') - 1
+            if lower < 0 or self.times[lower] + self.step <= start:
+                lower += 1
+        upper = len(self) if end is None else np.searchsorted(self.times, pd.Timestamp(end).to_datetime64(), side='right')
+        return self._slice(lower, upper)
+
+    def thin(self, max_points: int) -> "Rollup":
+        """
+        Reduziert die Buckets per min/max-Auswahl auf den Mittelwerten auf höchstens etwa max_points.
+        """
+        if len(self) <= max_points:
+            return self
+        return self._take(minmax_indices(self.mean, max_points))
+
+    def mean_series(self) -> TimeSeries:
+        """
+        Mittelwerte als TimeSeries (Zeitpunkt = Bucket-Mitte), z.B. für den Plot.
+        """
+        return TimeSeries._view(self.times + self.step // 2, self.mean)
+
+
+class RollupPyramid:
+    def __init__(self, series: TimeSeries, levels: tuple = ROLLUP_LEVELS):
+        """
+        Vorberechnete Aggregationen einer Zeitreihe in mehreren Auflösungen (z.B. 10 min, 1 h, 1 Tag).
+        Die Rohdaten bleiben in series, die Stufen werden einmal berechnet und mit extend() nur noch
+        um neue Observations ergänzt.
+        """
+        self.series = series
+        self.levels = [Rollup.from_series(series, freq) for freq in levels]
+
+    @property
+    def start(self) -> Optional[pd.Timestamp]:
+        return self.series.first_time
+
+    @property
+    def end(self) -> Optional[pd.Timestamp]:
+        return self.series.last_time
+
+    def extend(self, newer: TimeSeries) -> "RollupPyramid":
+        """
+        Gibt eine neue Pyramide zurück, die zusätzlich die neueren Observations enthält.
+        Berechnet werden nur die Buckets ab der ersten neuen Observation.
+        """
+        if not newer:
+            return self
+        pyramid = RollupPyramid.__new__(RollupPyramid)
+        pyramid.series = self.series.extend(newer)
+        pyramid.levels = [level.extend(Rollup.from_series(newer, level.freq)) for level in self.levels]
+        return pyramid
+
+    def select(self, start: Optional[pd.Timestamp], end: Optional[pd.Timestamp], max_points: int,
+               min_points: Optional[int] = None):
+        """
+        Wählt für den Zeitraum die gröbste Auflösung, die den Plot noch füllt (mindestens min_points Buckets,
+        Standard: max_points / POINTS_PER_PIXEL, also ein Bucket pro Pixel), und dünnt sie auf max_points aus.
+        Passen die Rohdaten ins Budget, werden sie unverändert genommen.
+        Rückgabe: TimeSeries (Rohdaten) oder Rollup
+        """
+        raw = self.series.window(start, end)
+        if len(raw) <= max_points:
+            return raw
+        if min_points is None:
+            min_points = max_points // POINTS_PER_PIXEL
+        for level in reversed(self.levels):
+            window = level.window(start, end)
+            if len(window) >= min_points:
+                return window.thin(max_points)
+        # Sehr dichte Messungen in einem kurzen Zeitraum: keine Stufe füllt den Plot
+        return raw.downsample(max_points)
+
+
+class RollupCache:
+    def __init__(self, levels: tuple = ROLLUP_LEVELS, max_entries: Optional[int] = None, ttl: Optional[float] = None):
+        """
+        Prozessweite Rollup-Pyramiden je Datastream. Neue Observations werden inkrementell ergänzt,
+        komplett neu berechnet wird nur, wenn eine Zeitreihe weiter in die Vergangenheit reicht.
+
+        max_entries: höchstens so viele Datastreams, die am längsten nicht benutzten werden verworfen (LRU)
+        ttl: Sekunden, nach denen eine Pyramide aus der übergebenen Zeitreihe neu gebaut wird
+             (gleiche Werte wie der Cache der Zeitreihen, damit beide zusammen ablaufen)
+        """
+        self.levels = levels
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # datastream_id -> (Pyramide, Zeitpunkt des Neubaus)
+        self._pyramids = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pyramids)
+
+    def get(self, datastream_id: int, series: TimeSeries) -> RollupPyramid:
+        """
+        Gibt die Pyramide eines Datastreams zurück, die mindestens den Zeitraum von series abdeckt.
+        """
+        with self._lock:
+            pyramid, built = self._pyramids.get(datastream_id, (None, None))
+            if pyramid is not None:
+                self._pyramids.move_to_end(datastream_id)
+        expired = built is not None and self.ttl is not None and time.monotonic() - built >= self.ttl
+        if expired or pyramid is None or not pyramid.series or (series and series.first_time < pyramid.start):
+            pyramid = RollupPyramid(series, self.levels)
+            built = time.monotonic()
+        elif series and series.last_time > pyramid.end:
+            pyramid = pyramid.extend(series.after(pyramid.end))
+        else:
+            return pyramid
+        with self._lock:
+            self._pyramids[datastream_id] = (pyramid, built)
+            self._pyramids.move_to_end(datastream_id)
+            while self.max_entries is not None and len(self._pyramids) > self.max_entries:
+                self._pyramids.popitem(last=False)
+        return pyramid
@@ -0,0 +1,59 @@
+import threading
+from typing import Any, Callable, Hashable
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self):
+        """
+        Fasst gleichzeitige Aufrufe mit demselben Schlüssel zusammen: nur der erste Aufrufer führt die
+        Funktion aus, alle weiteren warten auf dieses Ergebnis (bzw. dieselbe Exception).
+        Nach Abschluss wird nichts gespeichert, der nächste Aufruf führt die Funktion wieder aus.
+        """
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.executed = 0
+        self.shared = 0
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """
+        Führt fn() für key aus oder wartet auf den bereits laufenden Aufruf mit demselben key.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                self.shared += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def stats(self) -> dict:
+        """
+        Gibt zurück, wie oft ausgeführt und wie oft ein laufender Aufruf mitgenutzt wurde.
+        """
+        return {'executed': self.executed, 'shared': self.shared}
@@ -0,0 +1,164 @@
+import heapq
+import numpy as np
+from typing import Hashable, Optional
+
+EARTH_RADIUS_KM = 6371.0088
+# Maximale Anzahl Stationen in einem Blatt, Blätter werden vektorisiert durchsucht
+LEAF_SIZE = 16
+
+
+def to_unit_vectors(lat, lon) -> np.ndarray:
+    """
+    Wandelt Breiten-/Längengrade in Punkte auf der Einheitskugel (ECEF ohne Erdradius) um.
+    Der euklidische Abstand zweier Punkte (Sehne) wächst streng mit dem Großkreisabstand,
+    anders als Differenzen in Grad, bei denen ein Längengrad bei 54°N nur ~0,59 Breitengrade lang ist.
+    """
+    lat = np.radians(np.asarray(lat, dtype=np.float64))
+    lon = np.radians(np.asarray(lon, dtype=np.float64))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def chord_to_km(chord):
+    """
+    Sehnenlänge auf der Einheitskugel -> Großkreisabstand in km.
+    """
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+
+def km_to_chord(distance_km: float) -> float:
+    """
+    Großkreisabstand in km -> Sehnenlänge auf der Einheitskugel.
+    """
+    return 2 * np.sin(min(distance_km / EARTH_RADIUS_KM, np.pi) / 2)
+
+
+class StationIndex:
+    def __init__(self, stations: list):
+        """
+        Räumlicher Index (KD-Baum auf Einheitsvektoren) für die Suche nach Stationen um einen Kartenpunkt.
+        Wird einmal pro Datenstand gebaut, Abfragen kosten danach O(log n) statt einer Schleife über alle Stationen.
+
+        stations: Liste von (lat, lon, key), key z.B. Name oder @iot.id des Things
+        """
+        self.keys = [key for _, _, key in stations]
+        self.points = to_unit_vectors(
+            [lat for lat, _, _ in stations], [lon for _, lon, _ in stations]
+        ).reshape(-1, 3)
+
+        # Knoten als flache Listen: Blätter haben axis -1 und einen Bereich in self.order
+        self.order = np.arange(len(self.keys))
+        self._axis, self._split, self._children, self._ranges = [], [], [], []
+        if len(self.keys):
+            self._build(0, len(self.keys))
+
+    @classmethod
+    def from_things(cls, thing_dicts: list) -> "StationIndex":
+        """
+        Baut den Index aus preload-Daten (thing_dicts), key ist der Name des Things.
+        Things ohne Location werden übersprungen.
+        """
+        stations = []
+        for thing in thing_dicts:
+            if not thing.get("locations"):
+                continue
+            lon, lat = thing["locations"][0]["location"]["coordinates"][:2]
+            stations.append((lat, lon, thing["name"]))
+        return cls(stations)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def _build(self, start: int, end: int) -> int:
+        node = len(self._axis)
+        self._axis.append(-1)
+        self._split.append(0.0)
+        self._children.append((-1, -1))
+        self._ranges.append((start, end))
+        if end - start <= LEAF_SIZE:
+            return node
+
+        indices = self.order[start:end]
+        points = self.points[indices]
+        # An der Achse mit der größten Ausdehnung am Median teilen
+        axis = int(np.argmax(points.max(axis=0) - points.min(axis=0)))
+        middle = (end - start) // 2
+        partition = np.argpartition(points[:, axis], middle)
+        self.order[start:end] = indices[partition]
+        self._axis[node] = axis
+        self._split[node] = float(self.points[self.order[start + middle], axis])
+        left = self._build(start, start + middle)
+        right = self._build(start + middle, end)
+        self._children[node] = (left, right)
+        return node
+
+    def _search(self, target: np.ndarray, visit):
+        """
+        Durchläuft den Baum, nähere Hälfte zuerst. visit(indices, chords) wird für jedes erreichte Blatt
+        aufgerufen und gibt den aktuellen Suchradius (Sehne) zurück; weiter entfernte Teilbäume entfallen.
+        """
+        stack = [(0, 0.0)]
+        radius = np.inf
+        while stack:
+            node, bound = stack.pop()
+            if bound > radius:
+                continue
+            axis = self._axis[node]
+            if axis < 0:
+                start, end = self._ranges[node]
+                indices = self.order[start:end]
+                chords = np.linalg.norm(self.points[indices] - target, axis=1)
+                radius = visit(indices, chords)
+                continue
+            diff = target[axis] - self._split[node]
+            left, right = self._children[node]
+            near, far = (left, right) if diff < 0 else (right, left)
+            # Der ferne Teilbaum zuerst auf den Stack, damit der nahe zuerst bearbeitet wird
+            stack.append((far, abs(diff)))
+            stack.append((near, bound))
+
+    def nearest(self, lat: float, lon: float, k: int = 1) -> list:
+        """
+        Gibt die k nächsten Stationen als Liste von (key, Abstand in km) zurück, nächste zuerst.
+        """
+        if not len(self) or k < 1:
+            return []
+        target = to_unit_vectors(lat, lon)
+        best = []  # Max-Heap über negative Abstände
+
+        def visit(indices, chords):
+            for index, chord in zip(indices, chords):
+                if len(best) < k:
+                    heapq.heappush(best, (-chord, index))
+                elif chord < -best[0][0]:
+                    heapq.heapreplace(best, (-chord, index))
+            return -best[0][0] if len(best) == k else np.inf
+
+        self._search(target, visit)
+        return [(self.keys[index], float(chord_to_km(-chord))) for chord, index in sorted(best, reverse=True)]
+
+    def within_radius(self, lat: float, lon: float, radius_km: float) -> list:
+        """
+        Gibt alle Stationen im Umkreis von radius_km als Liste von (key, Abstand in km) zurück, nächste zuerst.
+        """
+        if not len(self):
+            return []
+        target = to_unit_vectors(lat, lon)
+        limit = km_to_chord(radius_km)
+        found = []
+
+        def visit(indices, chords):
+            inside = chords <= limit
+            found.extend(zip(chords[inside], indices[inside]))
+            return limit
+
+        self._search(target, visit)
+        found.sort()
+        return [(self.keys[index], float(chord_to_km(chord))) for chord, index in found]
+
+    def closest(self, lat: float, lon: float) -> Optional[Hashable]:
+        """
+        Key der nächsten Station oder None, wenn der Index leer ist.
+        """
+        result = self.nearest(lat, lon, k=1)
+        return result[0][0] if result else None
@@ -0,0 +1,129 @@
+import math
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from .FrostServer import unit_symbol
+
+
+def display_name(datastream_name: str) -> str:
+    """
+    Anzeigename eines Datastreams: 'WTemp* measured by sensor *...*' -> 'Wtemp', '_' wird zu Leerzeichen.
+    """
+    return datastream_name.split("*")[0].strip().capitalize().replace("_", " ")
+
+
+@dataclass(frozen=True)
+class DatastreamRecord:
+    """
+    Vorberechnete Anzeigedaten eines Datastreams. datastream verweist auf den Eintrag im Snapshot
+    (Observations, phenomenonTime), es wird nichts kopiert.
+    """
+    id: int
+    display_name: str
+    unit: str
+    datastream: dict
+
+    @property
+    def label(self) -> str:
+        """Name mit Einheit für Legenden und Popups, z.B. 'Wtemp [°C]'."""
+        return f"{self.display_name} [{self.unit}]" if self.unit else self.display_name
+
+
+@dataclass(frozen=True)
+class Station:
+    """
+    Kompakter Eintrag einer Marina bzw. eines Things. thing verweist auf das thing_dict im Snapshot.
+    lat/lon sind None, wenn das Thing keine Location hat.
+    """
+    id: int
+    name: str
+    lat: Optional[float]
+    lon: Optional[float]
+    datastreams: tuple
+    thing: dict
+
+    def latest_values(self) -> list:
+        """
+        Neuester Wert je Datastream als Liste von (DatastreamRecord, Wert), z.B. für Popups.
+        Datastreams ohne Observations werden ausgelassen.
+        """
+        return [
+            (record, record.datastream["observations"].last_value)
+            for record in self.datastreams if record.datastream.get("observations")
+        ]
+
+
+class StationRegistry:
+    def __init__(self, thing_dicts: list):
+        """
+        Verzeichnis aller Stationen eines Snapshots mit Zugriff über Name und @iot.id in O(1).
+        Anzeigenamen, Einheiten und Koordinaten werden einmal pro Snapshot berechnet, statt bei
+        jedem Rerun die thing_dicts zu durchsuchen. Die Reihenfolge der thing_dicts bleibt erhalten.
+
+        thing_dicts: Daten aus StreamlitApp.preload_data
+        """
+        self.stations = [self._station(thing) for thing in thing_dicts]
+        self.by_name = {}
+        self.by_id = {station.id: station for station in self.stations}
+        for station in self.stations:
+            # Bei doppelten Namen gewinnt wie bisher die erste Station
+            self.by_name.setdefault(station.name, station)
+
+    @staticmethod
+    def _station(thing: dict) -> Station:
+        lat = lon = None
+        if thing.get("locations"):
+            lon, lat = thing["locations"][0]["location"]["coordinates"][:2]
+        datastreams = tuple(
+            DatastreamRecord(
+                id=datastream["id"],
+                display_name=display_name(datastream["name"]),
+                unit=unit_symbol(datastream.get("unitOfMeasurement", {}).get("symbol")),
+                datastream=datastream,
+            )
+            for datastream in thing.get("datastreams", [])
+        )
+        return Station(
+            id=thing.get("@iot.id"), name=thing["name"], lat=lat, lon=lon, datastreams=datastreams, thing=thing
+        )
+
+    def __len__(self) -> int:
+        return len(self.stations)
+
+    def __iter__(self) -> Iterator[Station]:
+        return iter(self.stations)
+
+    def __contains__(self, key) -> bool:
+        return self.get(key) is not None
+
+    @property
+    def names(self) -> list:
+        return [station.name for station in self.stations]
+
+    def to_geojson(self) -> dict:
+        """
+        Alle Stationen mit Location als eine GeoJSON-FeatureCollection (Point-Features).
+        properties: name, id und values {Label mit Einheit: neuester Wert}, fehlende Werte als None.
+        """
+        features = []
+        for station in self.stations:
+            if station.lat is None:
+                continue
+            values = {
+                record.label: None if value is None or math.isnan(value) else value
+                for record, value in station.latest_values()
+            }
+            features.append({
+                "type": "Feature",
+                "geometry": {"type": "Point", "coordinates": [station.lon, station.lat]},
+                "properties": {"name": station.name, "id": station.id, "values": values},
+            })
+        return {"type": "FeatureCollection", "features": features}
+
+    def get(self, key) -> Optional[Station]:
+        """
+        Station zu einem Namen (str) oder einer @iot.id (int), None wenn unbekannt.
+        """
+        if isinstance(key, str):
+            return self.by_name.get(key)
+        return self.by_id.get(key)
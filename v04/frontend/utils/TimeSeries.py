@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+from typing import Optional
+
+from .Downsampling import downsample
+
+
+class TimeSeries:
+    """
+    Kompakte Zeitreihe eines Datastreams: zwei NumPy-Arrays statt Listen von Strings und Python-Floats.
+
+    times: datetime64[ns] (UTC ohne Zeitzone), aufsteigend sortiert, ohne NaT
+    values: float64, fehlende Werte als NaN (werden im Plot als Lücke gezeigt)
+    Pro Observation 16 Byte statt ~100+ Byte für einen str und einen float in zwei Listen.
+    Die Umwandlung in JSON-taugliche Listen passiert erst an der API-Grenze (to_dict).
+    """
+    __slots__ = ('times', 'values')
+
+    def __init__(self, times=None, values=None):
+        """
+        Übernimmt beliebig sortierte Arrays und bereinigt sie einmalig: ungültige Zeitpunkte
+        werden entfernt, dann wird aufsteigend (stabil) nach Zeit sortiert.
+        """
+        times = np.asarray(times if times is not None else [], dtype='datetime64[ns]')
+        values = np.asarray(values if values is not None else [], dtype=np.float64)
+        if len(times) != len(values):
+            raise ValueError(f"times und values haben unterschiedliche Längen ({len(times)} != {len(values)})")
+
+        valid = ~np.isnat(times)
+        if not valid.all():
+            times, values = times[valid], values[valid]
+        if len(times) > 1 and (np.diff(times) < np.timedelta64(0)).any():
+            order = np.argsort(times, kind='stable')
+            times, values = times[order], values[order]
+        self.times = times
+        self.values = values
+
+    @classmethod
+    def _view(cls, times: np.ndarray, values: np.ndarray) -> "TimeSeries":
+        """
+        Erzeugt eine TimeSeries aus bereits bereinigten Arrays (z.B. Slices) ohne erneute Prüfung und Kopie.
+        """
+        series = cls.__new__(cls)
+        series.times = times
+        series.values = values
+        return series
+
+    @classmethod
+    def from_dict(cls, observations: dict) -> "TimeSeries":
+        """
+        Liest das alte preload-Format {'time': ['YYYY-mm-dd HH:MM:SS', ...], 'values': [...]} ein.
+        """
+        times = pd.to_datetime(observations.get('time', []), errors="coerce", format="mixed")
+        values = pd.to_numeric(pd.Series(observations.get('values', []), dtype=object), errors="coerce")
+        return cls(times.to_numpy(dtype='datetime64[ns]'), values.to_numpy(dtype=np.float64))
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def __bool__(self) -> bool:
+        return len(self.times) > 0
+
+    def __repr__(self) -> str:
+        if not self:
+            return "TimeSeries(leer)"
+        return f"TimeSeries({len(self)} Werte, {self.first_time} bis {self.last_time})"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, TimeSeries):
+            return NotImplemented
+        return np.array_equal(self.times, other.times) and np.array_equal(self.values, other.values)
+
+    @property
+    def nbytes(self) -> int:
+        return self.times.nbytes + self.values.nbytes
+
+    @property
+    def first_time(self) -> Optional[pd.Timestamp]:
+        return pd.Timestamp(self.times[0]) if self else None
+
+    @property
+    def last_time(self) -> Optional[pd.Timestamp]:
+        return pd.Timestamp(self.times[-1]) if self else None
+
+    @property
+    def last_value(self) -> Optional[float]:
+        return float(self.values[-1]) if self else None
+
+    def after(self, time: pd.Timestamp) -> "TimeSeries":
+        """
+        Gibt die Observations mit Zeitpunkt nach time zurück (ohne Kopie, siehe window).
+        """
+        index = np.searchsorted(self.times, pd.Timestamp(time).to_datetime64(), side='right')
+        return TimeSeries._view(self.times[index:], self.values[index:])
+
+    def window(self, start: Optional[pd.Timestamp] = None, end: Optional[pd.Timestamp] = None) -> "TimeSeries":
+        """
+        Gibt die Observations im Zeitraum [start, end] zurück (beide optional).
+        Binäre Suche auf den sortierten Zeitpunkten, O(log n). Das Ergebnis teilt sich den Speicher
+        mit dieser Zeitreihe (NumPy-View), darf also nicht verändert werden.
+        """
+        lower = 0 if start is None else np.searchsorted(self.times, pd.Timestamp(start).to_datetime64(), side='left')
+        upper = len(self.times) if end is None else np.searchsorted(
+            self.times, pd.Timestamp(end).to_datetime64(), side='right'
+        )
+        return TimeSeries._view(self.times[lower:upper], self.values[lower:upper])
+
+    def extend(self, newer: "TimeSeries") -> "TimeSeries":
+        """
+        Hängt eine Zeitreihe mit neueren Observations an und gibt das Ergebnis als neue Zeitreihe zurück.
+        """
+        if not newer:
+            return self
+        return TimeSeries(np.concatenate([self.times, newer.times]), np.concatenate([self.values, newer.values]))
+
+    def downsample(self, max_points: int, method: str = "minmax") -> "TimeSeries":
+        """
+        Reduziert die Zeitreihe für die Darstellung auf höchstens etwa max_points Punkte (siehe utils/Downsampling.py).
+        """
+        return TimeSeries._view(*downsample(self.times, self.values, max_points, method))
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        DataFrame mit den Spalten time und values (aufsteigend), ohne die Daten erneut zu parsen.
+        """
+        return pd.DataFrame({'time': self.times, 'values': self.values})
+
+    def to_dict(self) -> dict:
+        """
+        JSON-taugliches preload-Format {'time': ['YYYY-mm-dd HH:MM:SS', ...], 'values': [...]},
+        neueste zuerst. Nur für die Ausgabe an APIs gedacht.
+        """
+        times = pd.DatetimeIndex(self.times[::-1]).strftime('%Y-%m-%d %H:%M:%S')
+        values = self.values[::-1].astype(object)
+        # NaN ist kein gültiges JSON
+        values[np.isnan(self.values[::-1])] = None
+        return {'time': list(times), 'values': values.tolist()}
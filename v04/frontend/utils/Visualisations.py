@@ -6,67 +6,142 @@ from pprint import pprint
 import folium
 from streamlit_folium import st_folium
 from folium import Popup, IFrame
+from folium.plugins import FastMarkerCluster
+from .TimeSeries import TimeSeries
+from .Downsampling import downsample, point_budget
+from .StationRegistry import StationRegistry
+
+# Ab so vielen Punkten wird ein Trace mit WebGL (go.Scattergl) statt als SVG (go.Scatter) gezeichnet
+WEBGL_THRESHOLD = 5000
+
+
+def line_trace(x, y, webgl_threshold: int | None = WEBGL_THRESHOLD, **kwargs):
+    """
+    Erstellt einen Linien-Trace: go.Scatter (SVG) oder bei vielen Punkten go.Scattergl (WebGL).
+    Beide bekommen dieselben Optionen (mode, name, line, visible, hover...), Aussehen und Legende bleiben gleich.
+
+    :param webgl_threshold: Ab dieser Punktzahl WebGL verwenden, None für immer SVG.
+    """
+    use_webgl = webgl_threshold is not None and len(x) >= webgl_threshold
+    trace = go.Scattergl if use_webgl else go.Scatter
+    return trace(x=x, y=y, **kwargs)
+
+
+# Darstellung der Stationen auf der Karte:
+# 'markers': ein folium.Marker mit Popup je Station
+# 'cluster': alle Stationen in einem Koordinaten-Array, Marker und Cluster erzeugt erst der Browser
+# 'geojson': alle Stationen als eine GeoJSON-FeatureCollection in einem Layer, gestylt im Browser
+MAP_MODES = ("markers", "cluster", "geojson")
+
+# Aussehen der Stationen im geojson-Modus (Leaflet-Optionen für jeden Punkt, im Browser angewendet)
+STATION_STYLE = dict(radius=7, color="#053246", weight=1, fill=True, fill_color="#ff6666", fill_opacity=0.9)
+
+# Erzeugt im Browser je Zeile [lat, lon, name(, popup_html)] einen Marker (für FastMarkerCluster)
+CLUSTER_CALLBACK = """
+var callback = function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]));
+    marker.bindTooltip(row[2]);
+    if (row.length > 3) {
+        marker.bindPopup(row[3], {maxWidth: 400});
+    }
+    return marker;
+};
+"""
+
+
+# Zeitausschnitte der LinePlot-Buttons (Beschriftung, Anzahl Tage bis zum neuesten Punkt)
+PLOT_RANGES = (("Letzte 24 Stunden", 1), ("Letzte 7 Tage", 7), ("Letzter Monat", 31), ("Letztes Jahr", 365))
+
 
 # -----------------------------------
 class ShowMap:
-    def __init__(self, data: list[dict], zoom: int = 7, control_scale: bool = False):
+    def __init__(self, data: list[dict], zoom: int = 7, control_scale: bool = False,
+                 registry: StationRegistry | None = None, mode: str = "markers", lazy_popups: bool = False,
+                 geojson: dict | None = None):
         """
         Initialisiert die Klasse zur Darstellung einer Karte mit Marinas.
 
         :param data: Liste von Marinas mit Standort- und Messwertinformationen.
         :param zoom: Zoom-Stufe der Karte.
         :param control_scale: Ob eine Skalierungssteuerung angezeigt werden soll.
+        :param registry: StationRegistry zu data (z.B. aus dem Snapshot), sonst wird sie hier gebaut.
+        :param mode: 'markers' oder 'cluster' (für viele Stationen), siehe MAP_MODES.
+        :param lazy_popups: Marker ohne Popup, nur mit Namen (Schlüssel der StationRegistry) als Tooltip.
+                            Die Details zeigt die App erst nach dem Klick, die Karte enthält nur Koordinaten und Namen.
+        :param geojson: FeatureCollection der Stationen für mode='geojson' als dict
+                        (z.B. einmal pro Snapshot erzeugt), sonst aus registry.to_geojson().
+                        Die neuesten Werte stehen dort in properties, eingebettete Popups gibt es in diesem Modus nicht.
         """
+        if mode not in MAP_MODES:
+            raise ValueError(f"Unbekannter Kartenmodus: {mode}")
+        self.mode = mode
+        self.lazy_popups = lazy_popups
+        self.geojson = geojson
         self.data = data
         self.zoom = zoom
         self.control_scale = control_scale
+        self.registry = registry if registry is not None else StationRegistry(data)
 
     def extract_measurements(self, marina: dict, measurement_key:str) -> float | None:
         """
         Extrahiert die aktuellste verfügbare Wassertemperatur aus den Messwerten einer Marina.
 
-        :param marina: Dictionary mit Messwerten der Marina.
+        :param marina: Dictionary mit Messwerten (TimeSeries) der Marina.
         :return: Letzte bekannte Wassertemperatur oder None, falls keine verfügbar.
         """
         measurement = marina.get("measurement", {})
-        water_temp_data = measurement.get(measurement_key)
+        water_temp_data: TimeSeries | None = measurement.get(measurement_key)
 
         if water_temp_data:
-            df = pd.DataFrame.from_dict(water_temp_data)
-            df["time"] = pd.to_datetime(df["time"], errors="coerce")
-            df["values"] = pd.to_numeric(df["values"], errors="coerce")
-            df.dropna(inplace=True)
-            df.sort_values(by="time", ascending=False, inplace=True)
-
-            return round(df["values"].iloc[0], 2) if not df.empty else None
+            # Die Zeitreihe ist aufsteigend sortiert, der letzte gültige Wert ist der neueste
+            values = water_temp_data.values[~np.isnan(water_temp_data.values)]
+            return round(float(values[-1]), 2) if len(values) else None
         return None
 
+    def popup_html(self, station) -> str:
+        """
+        Popup-HTML einer Station: neuester Wert je Datastream
+        (Namen und Einheiten vorberechnet in der StationRegistry).
+        """
+        return "<br>".join(
+            f"{ds_item.display_name}: {value} {ds_item.unit}" for ds_item, value in station.latest_values()
+        )
+
     def plot(self):
         m = folium.Map(location=[54.3323, 10.1519], zoom_start=self.zoom)
+        if self.mode == "geojson":
+            # Ein Layer für alle Stationen; Klicks liefern properties.name als Tooltip.
+            # Als dict übergeben, folium parst dann keinen JSON-String
+            folium.GeoJson(
+                self.geojson if self.geojson is not None else self.registry.to_geojson(),
+                name="Stationen",
+                marker=folium.CircleMarker(**STATION_STYLE),
+                tooltip=folium.GeoJsonTooltip(fields=["name"], labels=False),
+            ).add_to(m)
+            return m
 
-        for marina in self.data:
-            loc = marina["locations"][0]["location"]["coordinates"]
-            lat, lon = loc[1], loc[0]
-
-            # Popup-HTML zusammenbauen
-            ds = marina.get("datastreams", [])
-            popup_html = "<br>".join(
-                f"{ds_item['name'].split('*')[0].strip().capitalize().replace('_', ' ')}: "
-                f"{ds_item['observations']['values'][0]} "
-                f"{ds_item.get('unitOfMeasurement',{}).get('symbol','')}"
-                for ds_item in ds if ds_item.get("observations",{}).get("values")
-            )
+        stations = [station for station in self.registry if station.lat is not None]
 
-            # 1) Einfaches Popup mit max_width
-            popup = Popup(popup_html, max_width=400)
+        if self.mode == "cluster":
+            # Ein kompaktes Array statt eines Python-Objekts je Marker
+            rows = [[station.lat, station.lon, station.name] for station in stations]
+            if not self.lazy_popups:
+                for row, station in zip(rows, stations):
+                    row.append(self.popup_html(station))
+            FastMarkerCluster(data=rows, callback=CLUSTER_CALLBACK).add_to(m)
+            return m
+
+        for station in stations:
+            # 1) Einfaches Popup mit max_width (entfällt bei lazy_popups)
+            popup = None if self.lazy_popups else Popup(self.popup_html(station), max_width=400)
 
             # Alternativ 2) IFrame, um auch Höhe zu steuern und HTML komplexer zu gestalten:
             # iframe = IFrame(html=popup_html, width=300, height=150)
             # popup = Popup(iframe, max_width=400)
 
             folium.Marker(
-                location=(lat, lon),
-                tooltip=marina["name"],
+                location=(station.lat, station.lon),
+                tooltip=station.name,
                 popup=popup,
             ).add_to(m)
 
@@ -76,23 +151,83 @@ class ShowMap:
 
 
 class LinePlot:
-    def __init__(self, x, y, title, x_label, y_label):
+    def __init__(self, x, y, title, x_label, y_label, width: int = 1500, downsampling: str | None = "minmax",
+                 webgl_threshold: int | None = WEBGL_THRESHOLD):
+        """
+        :param width: Breite des Plots in Pixeln, bestimmt das Punktebudget des Traces.
+        :param downsampling: 'minmax', 'lttb' oder None für alle Rohdaten.
+        :param webgl_threshold: Ab dieser Punktzahl mit WebGL zeichnen (siehe line_trace).
+        """
         self.x = x
         self.y = y
         self.x_label = x_label
         self.y_label = y_label
         self.title = title
+        self.width = width
+        self.downsampling = downsampling
+        self.webgl_threshold = webgl_threshold
 
         # Konvertiere x in ein Datetime-Format, falls es nicht bereits ist
         self.x = pd.to_datetime(self.x)
 
+    def sorted_data(self) -> tuple:
+        """
+        Gibt alle Rohdaten als nach Zeit sortierte Arrays (x, y) zurück.
+        """
+        x = np.asarray(self.x, dtype='datetime64[ns]')
+        y = pd.to_numeric(pd.Series(self.y), errors="coerce").to_numpy(dtype=np.float64)
+        order = np.argsort(x, kind='stable')
+        return x[order], y[order]
+
+    def plot_data(self) -> tuple:
+        """
+        Gibt die zu zeichnenden Punkte zurück: nach Zeit sortiert und auf das Punktebudget reduziert.
+        """
+        if self.downsampling is None:
+            x = np.asarray(self.x, dtype='datetime64[ns]')
+            return x, pd.to_numeric(pd.Series(self.y), errors="coerce").to_numpy(dtype=np.float64)
+        x, y = self.sorted_data()
+        return downsample(x, y, point_budget(self.width), self.downsampling)
+
+    def range_buttons(self) -> list:
+        """
+        Buttons für die Zeitausschnitte. Ohne Downsampling wird nur die x-Achse verschoben.
+        Mit Downsampling bekommt jeder Ausschnitt eigene, für seinen Zeitraum reduzierte Daten (method 'update'),
+        sonst würden beim Hineinzoomen nur die groben Buckets der gesamten Zeitreihe zu sehen sein.
+        """
+        end = self.x.max()
+        if self.downsampling is None:
+            return [
+                dict(label=label, method="relayout", args=["xaxis.range", [end - pd.Timedelta(days=days), end]])
+                for label, days in PLOT_RANGES
+            ]
+
+        x, y = self.sorted_data()
+        buttons = []
+        for label, days in PLOT_RANGES:
+            start = end - pd.Timedelta(days=days)
+            lower = np.searchsorted(x, start.to_datetime64(), side='left')
+            x_range, y_range = downsample(x[lower:], y[lower:], point_budget(self.width), self.downsampling)
+            buttons.append(dict(
+                label=label, method="update",
+                args=[{"x": [x_range], "y": [y_range]}, {"xaxis.range": [start, end]}],
+            ))
+        x_all, y_all = downsample(x, y, point_budget(self.width), self.downsampling)
+        buttons.append(dict(
+            label="Alle Daten", method="update",
+            args=[{"x": [x_all], "y": [y_all]}, {"xaxis.autorange": True}],
+        ))
+        return buttons
+
     def plot(self):
+        x_plot, y_plot = self.plot_data()
         # Erstelle den Plot
         fig = go.Figure(
             [
-                go.Scatter(
-                    x=self.x,
-                    y=self.y,
+                line_trace(
+                    x_plot,
+                    y_plot,
+                    webgl_threshold=self.webgl_threshold,
                     mode="lines",
                     name=self.title,
                     line=dict(color="rgb(255, 102, 102)", width=2),
@@ -122,40 +257,7 @@ class LinePlot:
                     yanchor="top",  # Verankerung der Buttons an der oberen Seite
                     showactive=False,
                     direction="down",  # Die Buttons werden untereinander angezeigt
-                    buttons=[
-                        dict(
-                            label="Letzte 24 Stunden",
-                            method="relayout",
-                            args=[
-                                "xaxis.range",
-                                [self.x.max() - pd.Timedelta(days=1), self.x.max()],
-                            ],
-                        ),
-                        dict(
-                            label="Letzte 7 Tage",
-                            method="relayout",
-                            args=[
-                                "xaxis.range",
-                                [self.x.max() - pd.Timedelta(days=7), self.x.max()],
-                            ],
-                        ),
-                        dict(
-                            label="Letzter Monat",
-                            method="relayout",
-                            args=[
-                                "xaxis.range",
-                                [self.x.max() - pd.Timedelta(days=31), self.x.max()],
-                            ],
-                        ),
-                        dict(
-                            label="Letztes Jahr",
-                            method="relayout",
-                            args=[
-                                "xaxis.range",
-                                [self.x.max() - pd.Timedelta(days=365), self.x.max()],
-                            ],
-                        ),
-                    ],
+                    buttons=self.range_buttons(),
                 )
             ],
         )
@@ -219,22 +321,23 @@ class Windrose:
         return fig
 
 
+# Beispiel-Nutzung (aus v04/frontend: python -m utils.Visualisations):
 if __name__ == "__main__":
     test_data = [{'@iot.id': 3,
   'datastreams': [{'description': 'WTemp c7991906-983b-4bf3-849f-14a139ffe4f3',
                    'id': 1,
                    'name': 'WTemp* measured by sensor '
                            '*c7991906-983b-4bf3-849f-14a139ffe4f3*',
-                   'observations': {'time': ['2025-05-13 10:36:59',
-                                             '2025-05-13 09:37:00',
-                                             '2025-05-13 08:37:04',
-                                             '2025-05-13 07:37:19',
-                                             '2025-05-13 06:37:09'],
-                                    'values': [14.62,
-                                               14.37,
-                                               14.18,
-                                               14.0,
-                                               13.87]}}],
+                   'observations': TimeSeries.from_dict({'time': ['2025-05-13 10:36:59',
+                                                                  '2025-05-13 09:37:00',
+                                                                  '2025-05-13 08:37:04',
+                                                                  '2025-05-13 07:37:19',
+                                                                  '2025-05-13 06:37:09'],
+                                                         'values': [14.62,
+                                                                    14.37,
+                                                                    14.18,
+                                                                    14.0,
+                                                                    13.87]})}],
   'description': 'LoRaWan box for temperature at Kiel, Reventlou.',
   'locations': [{'@iot.id': 1,
                  '@iot.selfLink': 'https://timeseries.geomar.de/soop/FROST-Server/v1.1/Locations(1)',